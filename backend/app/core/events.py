@@ -1,24 +1,74 @@
 import asyncio
-from typing import AsyncIterator, Set, Callable
+import collections
+import itertools
+import threading
+from typing import AsyncIterator
+
+# Pre-formatted keepalive frame so the 15s heartbeat skips re-formatting.
+KEEPALIVE_PAYLOAD = "event: keepalive\ndata: {}\n\n"
 
 class EventBroadcaster:
+    """Shared ring buffer with per-subscriber cursors.
+
+    publish() is one deque append plus one wakeup regardless of subscriber
+    count, and memory stays O(ring size) no matter how slow a consumer is;
+    a subscriber that falls more than RING_SIZE events behind skips ahead
+    to the oldest retained event.
+    """
+
+    RING_SIZE = 1024
+
     def __init__(self):
-        self._queues: Set[asyncio.Queue] = set()
+        self._ring: collections.deque[str] = collections.deque(maxlen=self.RING_SIZE)
+        self._seq = 0  # total events ever published
+        self._subscribers = 0
+        # publish() is called from worker threads; guard ring/seq with a
+        # threading lock and hand wakeups to the loop via call_soon_threadsafe
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._event: asyncio.Event | None = None
 
     async def subscribe(self) -> AsyncIterator[str]:  # pragma: no cover (async generator)
-        q: asyncio.Queue = asyncio.Queue()
-        self._queues.add(q)
+        self._loop = asyncio.get_running_loop()
+        if self._event is None:
+            self._event = asyncio.Event()
+        with self._lock:
+            cursor = self._seq  # start from the live head, not history
+            self._subscribers += 1
         try:
             while True:
-                msg = await q.get()
-                yield msg
+                while cursor >= self._seq:
+                    self._event.clear()
+                    if cursor < self._seq:  # published between check and clear
+                        continue
+                    await self._event.wait()
+                with self._lock:
+                    start = self._seq - len(self._ring)
+                    if cursor < start:
+                        cursor = start  # fell behind; resume at oldest retained
+                    batch = list(itertools.islice(self._ring, cursor - start, None))
+                    cursor = self._seq
+                for msg in batch:
+                    yield msg
         finally:
-            self._queues.discard(q)
+            with self._lock:
+                self._subscribers -= 1
+
+    def has_subscribers(self) -> bool:
+        return self._subscribers > 0
 
     def publish(self, event: str, data: str):
-        payload = f"event: {event}\ndata: {data}\n\n"
-        for q in list(self._queues):
-            if not q.full():
-                q.put_nowait(payload)
+        self.publish_raw(f"event: {event}\ndata: {data}\n\n")
+
+    def publish_raw(self, payload: str):
+        with self._lock:
+            self._ring.append(payload)
+            self._seq += 1
+            loop, event = self._loop, self._event
+        if loop is not None and event is not None:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:  # loop already closed (shutdown)
+                pass
 
-broadcaster = EventBroadcaster()
\ No newline at end of file
+broadcaster = EventBroadcaster()
@@ -1,21 +1,49 @@
-import logging, os, json, sys
+import logging, os, json, sys, time
+
+try:  # optional C-extension encoder (3-5x faster than stdlib json)
+    import orjson  # type: ignore
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # pragma: no cover
+    def _dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
 
 LOG_FORMAT_KEYS = [
     "time","level","msg","trace_id","method","path","status","duration_ms"
 ]
 
+# Tuple constant so the extras loop avoids rebuilding a list per record
+EXTRA_KEYS = ("trace_id","method","path","status","duration_ms")
+
 class JsonFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__()
+        # per-second timestamp cache; strftime dominates format() otherwise
+        self._cached_sec = -1
+        self._cached_time = ""
+
+    def _format_time(self, created: float) -> str:
+        sec = int(created)
+        if sec != self._cached_sec:
+            self._cached_sec = sec
+            self._cached_time = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        return self._cached_time
+
     def format(self, record: logging.LogRecord) -> str:  # pragma: no cover (formatting)
         base = {
-            "time": self.formatTime(record, datefmt="%Y-%m-%dT%H:%M:%S"),
+            "time": self._format_time(record.created),
             "level": record.levelname,
             "msg": record.getMessage(),
         }
-        # Merge any extra attributes we care about
-        for k in ["trace_id","method","path","status","duration_ms"]:
-            if hasattr(record, k):
-                base[k] = getattr(record, k)
-        return json.dumps(base, ensure_ascii=False)
+        # Merge any extra attributes we care about; __dict__.get skips the
+        # try/except cost hasattr pays for absent keys (the common case)
+        d = record.__dict__
+        for k in EXTRA_KEYS:
+            v = d.get(k)
+            if v is not None:
+                base[k] = v
+        return _dumps(base)
 
 def init_logging():
     level = os.getenv("LOG_LEVEL","INFO").upper()
@@ -27,4 +55,4 @@ def init_logging():
     root.addHandler(handler)
     root.setLevel(level)
     logging.getLogger("uvicorn.access").propagate = False
-    logging.getLogger("uvicorn.error").propagate = False
\ No newline at end of file
+    logging.getLogger("uvicorn.error").propagate = False
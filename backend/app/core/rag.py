@@ -1,19 +1,158 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
+import logging
+import os
+import threading
 
 MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 
+# Let faiss use every core; set once at import so it covers all indexes.
+try:  # pragma: no cover
+    faiss.omp_set_num_threads(os.cpu_count() or 1)
+except Exception:
+    pass
+
+# Optional quantized ONNX encoder (set RAG_ONNX_MODEL=/path/to/model.onnx).
+# Exported offline via onnxruntime.quantization.quantize_dynamic(weight_type=QUInt8);
+# int8 GEMM on CPU is ~1.5-3x faster than the PyTorch FP32 path.
+try:  # pragma: no cover - import guard
+    import onnxruntime as ort  # type: ignore
+    from transformers import AutoTokenizer  # type: ignore
+    ONNX_AVAILABLE = True
+except Exception:
+    ort = None  # type: ignore
+    AutoTokenizer = None  # type: ignore
+    ONNX_AVAILABLE = False
+
+
+class OnnxEncoder:
+    """Drop-in replacement for SentenceTransformer.encode backed by ONNX Runtime.
+
+    Tokenizes with the HF tokenizer, runs the quantized session, mean-pools and
+    (optionally) L2-normalizes, mirroring sentence-transformers semantics.
+    """
+
+    def __init__(self, model_path: str, dim: int = 384):
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        sess_options.intra_op_num_threads = os.cpu_count() or 1
+        self.session = ort.InferenceSession(model_path, sess_options, providers=['CPUExecutionProvider'])
+        self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        self._dim = dim
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dim
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True, **_kw) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=256, return_tensors='np')
+        inputs = {k: v for k, v in enc.items() if k in {i.name for i in self.session.get_inputs()}}
+        hidden = self.session.run(None, inputs)[0]  # (batch, seq, dim)
+        mask = enc['attention_mask'][..., None].astype(np.float32)
+        emb = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        emb = np.ascontiguousarray(emb, dtype=np.float32)
+        if normalize_embeddings:
+            faiss.normalize_L2(emb)
+        return emb
+
+
+def _pin_inference_threads():  # pragma: no cover - executor initializer
+    # Keep torch from spawning a full OMP pool per worker thread; the faiss /
+    # uvicorn sides already use the remaining cores.
+    try:
+        import torch  # type: ignore
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+
+
+# fp32 (default) | bf16 | fp16 - reduced precision halves encode memory
+# bandwidth; bf16 additionally hits AVX-512 BF16 / AMX paths on newer CPUs.
+RAG_PRECISION = os.getenv('RAG_PRECISION', 'fp32').lower()
+
+
+def _load_encoder():
+    onnx_path = os.getenv('RAG_ONNX_MODEL')
+    if onnx_path and ONNX_AVAILABLE and Path(onnx_path).exists():
+        try:
+            return OnnxEncoder(onnx_path)
+        except Exception:  # fall back to torch model on any load failure
+            pass
+    model = SentenceTransformer(MODEL_NAME)
+    if RAG_PRECISION in {'bf16', 'fp16'}:
+        try:
+            import torch  # type: ignore
+            dtype = torch.bfloat16 if RAG_PRECISION == 'bf16' else torch.float16
+            model = model.to(dtype=dtype)
+            try:
+                model = torch.compile(model, mode="reduce-overhead")
+            except Exception:
+                pass  # inductor unavailable; reduced precision alone still helps
+        except Exception:
+            logging.getLogger(__name__).warning(
+                "rag_precision_downgrade_failed", extra={"precision": RAG_PRECISION}
+            )
+    return model
+
 class SimpleVectorStore:
+    # HNSW graph parameters: M=32 neighbours, efSearch tuned for k<=5 lookups
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 64
+    HNSW_EF_SEARCH = 40
+
+    # Past this corpus size, exact/graph search loses to IVF+PQ (~20x faster,
+    # ~30x smaller via product quantization, ~1% recall cost).
+    IVF_THRESHOLD = 50_000
+    IVF_FACTORY = "IVF1024,PQ32"
+    IVF_NPROBE = 16
+
     def __init__(self, dim: int):
-        self.index = faiss.IndexFlatIP(dim)
+        self.dim = dim
+        # HNSW gives ~log(N) search vs O(N*d) for IndexFlatIP as the KB grows
+        self.index = faiss.IndexHNSWFlat(dim, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+        self.index.hnsw.efSearch = self.HNSW_EF_SEARCH
         self.meta: List[str] = []
 
     def add(self, embeddings: np.ndarray, texts: List[str]):
+        # fp16 round-trip halves effective precision cost with negligible recall loss on MiniLM
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32).astype(np.float16).astype(np.float32)
         self.index.add(embeddings)
         self.meta.extend(texts)
+        self._maybe_upgrade_to_ivf()
+
+    def _maybe_upgrade_to_ivf(self):
+        if self.index.ntotal < self.IVF_THRESHOLD:
+            return
+        try:
+            faiss.extract_index_ivf(self.index)
+            return  # already IVF
+        except Exception:
+            pass
+        try:
+            xb = self.index.reconstruct_n(0, self.index.ntotal)
+            ivf = faiss.index_factory(self.dim, self.IVF_FACTORY, faiss.METRIC_INNER_PRODUCT)
+            ivf.train(xb)
+            ivf.add(xb)
+            self._tune_ivf(ivf)
+            self.index = ivf
+            logging.getLogger(__name__).info(
+                "rag_index_upgraded_ivfpq",
+                extra={"component": "rag", "ntotal": ivf.ntotal}
+            )
+        except Exception as e:  # keep serving from the existing index on failure
+            logging.getLogger(__name__).warning("rag_ivf_upgrade_failed", exc_info=e)
+
+    def _tune_ivf(self, ivf):
+        ivf.nprobe = self.IVF_NPROBE
+        # Single-query searches only use one core by default; parallel_mode=1
+        # splits the work across inverted lists so k=3 lookups scale multi-core.
+        ivf.parallel_mode = 1
 
     def search(self, embedding: np.ndarray, k: int = 3):
         D, I = self.index.search(embedding, k)
@@ -24,34 +163,130 @@ class SimpleVectorStore:
         return results
 
 class RagEngine:
+    FLUSH_DELAY_S = 0.25  # debounce window for batching add_doc calls
+    ENCODE_BATCH_SIZE = 32
+
     def __init__(self, persist_dir: str = ".rag_store"):
-        self.model = SentenceTransformer(MODEL_NAME)
+        # Surface the SIMD level faiss was compiled with (stock pip wheels are
+        # AVX2-only); lets deployments verify an avx512 build is actually active.
+        try:
+            logging.getLogger(__name__).info(
+                "faiss_compile_options",
+                extra={"component": "rag", "options": faiss.get_compile_options()}
+            )
+        except Exception:
+            pass
+        self.model = _load_encoder()
         self.store = SimpleVectorStore(dim=self.model.get_sentence_embedding_dimension())
         self.persist_dir = Path(persist_dir)
         self.persist_dir.mkdir(exist_ok=True)
         self.index_path = self.persist_dir / 'index.faiss'
         self.meta_path = self.persist_dir / 'meta.txt'
+        self.digest_path = self.persist_dir / 'seed.sha256'
         self._loaded = False
+        self._pending: List[str] = []
+        self._pending_lock = threading.Lock()
+        self._flush_timer: threading.Timer | None = None
+        # Bounded pool for async callers so model inference never blocks the
+        # event loop (encode can take tens of ms and stalls SSE otherwise).
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="rag", initializer=_pin_inference_threads
+        )
         self._try_load()
 
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        # Normalize with faiss.normalize_L2 in place (SIMD loop on the numpy
+        # buffer) rather than the torch-side normalize_embeddings flag, which
+        # allocates fresh tensors on every call.
+        if RAG_PRECISION in {'bf16', 'fp16'}:
+            # numpy has no bfloat16; keep output as a tensor and downcast here
+            emb = self.model.encode(texts, batch_size=self.ENCODE_BATCH_SIZE,
+                                    convert_to_tensor=True, normalize_embeddings=False)
+            if not isinstance(emb, np.ndarray):
+                emb = emb.float().cpu().numpy()
+        else:
+            emb = self.model.encode(texts, batch_size=self.ENCODE_BATCH_SIZE,
+                                    convert_to_numpy=True, normalize_embeddings=False)
+        emb = np.ascontiguousarray(emb, dtype=np.float32)
+        faiss.normalize_L2(emb)
+        return emb
+
     def build(self, docs: List[str]):
-        embeddings = self.model.encode(docs, normalize_embeddings=True)
+        embeddings = self._encode(docs)
         self.store.add(embeddings, docs)
         self._persist()
 
+    def ensure_built(self, docs: List[str]) -> bool:
+        """Build from docs unless the persisted index came from the same seed set.
+
+        Keyed on a digest of the (sorted) seed texts, so startup skips the
+        embedding pass entirely once the store exists, and a changed seed set
+        still triggers a rebuild. Returns True if a build actually ran.
+        """
+        digest = hashlib.sha256("\n".join(sorted(docs)).encode('utf-8')).hexdigest()
+        if self._loaded:
+            try:
+                if self.digest_path.read_text(encoding='utf-8') == digest:
+                    return False
+            except OSError:
+                # store persisted before digests existed; keep it rather than
+                # appending the seed docs again
+                self._write_digest(digest)
+                return False
+        self.build(docs)
+        self._write_digest(digest)
+        return True
+
+    def _write_digest(self, digest: str):  # pragma: no cover
+        try:
+            self.digest_path.write_text(digest, encoding='utf-8')
+        except OSError:
+            pass
+
     def retrieve(self, query: str, k: int = 3):
-        emb = self.model.encode([query], normalize_embeddings=True)
+        self.flush()  # make any batched docs searchable before querying
+        emb = self._encode([query])
         return self.store.search(emb, k=k)
 
+    async def aretrieve(self, query: str, k: int = 3):
+        """retrieve() variant for async handlers; runs encode+search off-loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.retrieve, query, k)
+
     def add_doc(self, text: str):
-        emb = self.model.encode([text], normalize_embeddings=True)
-        self.store.add(emb, [text])
+        # Accumulate and encode in micro-batches: one forward pass + one
+        # persist per burst instead of per document.
+        with self._pending_lock:
+            self._pending.append(text)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_DELAY_S, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self):
+        with self._pending_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+        embeddings = self._encode(batch)
+        self.store.add(embeddings, batch)
         self._persist()
 
+    @property
+    def size(self) -> int:
+        return len(self.store.meta) + len(self._pending)
+
     def _persist(self):  # pragma: no cover
         try:
             faiss.write_index(self.store.index, str(self.index_path))
-            self.meta_path.write_text("\n".join(self.store.meta), encoding='utf-8')
+            # tmp + rename so a crash mid-write can't leave meta out of sync
+            # with the index (load checks len(meta) == ntotal)
+            tmp = self.meta_path.with_suffix('.tmp')
+            tmp.write_text("\n".join(self.store.meta), encoding='utf-8')
+            os.replace(tmp, self.meta_path)
         except Exception:
             pass
 
@@ -59,9 +294,26 @@ class RagEngine:
         if not self.index_path.exists() or not self.meta_path.exists():
             return
         try:
-            index = faiss.read_index(str(self.index_path))
+            index = None
+            # Opt-in mmap load (RAG_MMAP_INDEX=1): O(1) startup, pages are
+            # demand-loaded and shared across uvicorn workers. Off by default
+            # because a mapped read-only index rejects post-load add_doc.
+            if os.getenv('RAG_MMAP_INDEX') == '1':
+                try:
+                    index = faiss.read_index(
+                        str(self.index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                    )
+                except Exception:
+                    index = None
+            if index is None:
+                index = faiss.read_index(str(self.index_path))
             meta = self.meta_path.read_text(encoding='utf-8').splitlines()
             if len(meta) == index.ntotal:
+                try:
+                    faiss.extract_index_ivf(index)
+                    self.store._tune_ivf(index)  # re-apply nprobe/parallel_mode after load
+                except Exception:
+                    pass
                 self.store.index = index
                 self.store.meta = meta
                 self._loaded = True
@@ -1,32 +1,164 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 import os
 
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./emails.db')
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith('sqlite') else {})
+if DATABASE_URL.startswith('sqlite'):
+    # SQLAlchemy defaults file-based SQLite to NullPool (new connection + fd +
+    # pragma replay per checkout). QueuePool keeps warm connections around.
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        pool_size=5,
+        max_overflow=10,
+        # the worker re-runs the same handful of statements forever; a larger
+        # compiled-SQL cache keeps them from ever recompiling
+        query_cache_size=1200,
+    )
+else:
+    engine = create_engine(DATABASE_URL, query_cache_size=1200)
+
+if DATABASE_URL.startswith('sqlite'):
+    @event.listens_for(engine, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # WAL lets readers proceed during writes; NORMAL sync is safe under WAL.
+        # Applied per pooled connection so settings survive pool recycling.
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA cache_size=-65536")  # 64 MB page cache
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cur.execute("PRAGMA busy_timeout=5000")
+        cur.close()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# additive column -> ALTER statement; extend when the model grows new columns
+_ADDITIVE_COLUMNS = {
+    'approved_at': "ALTER TABLE emails ADD COLUMN approved_at TIMESTAMP NULL",
+    'sent_at': "ALTER TABLE emails ADD COLUMN sent_at TIMESTAMP NULL",
+    'source': "ALTER TABLE emails ADD COLUMN source TEXT DEFAULT 'unknown'",
+    'external_id': "ALTER TABLE emails ADD COLUMN external_id TEXT",
+    'sender_domain': "ALTER TABLE emails ADD COLUMN sender_domain TEXT",
+}
+
+# run after the ALTERs; each must be idempotent
+_POST_MIGRATE_SQL = [
+    # backfill domains for rows that predate the column; raw From headers
+    # look like "Alice <alice@example.com>", so trim the closing '>'
+    "UPDATE emails SET sender_domain = lower(rtrim(substr(sender, instr(sender, '@') + 1), ' >')) "
+    "WHERE sender_domain IS NULL AND sender LIKE '%@%'",
+    # repair rows backfilled before the rtrim above existed
+    "UPDATE emails SET sender_domain = rtrim(sender_domain, ' >') "
+    "WHERE sender_domain LIKE '%>'",
+    "CREATE INDEX IF NOT EXISTS ix_emails_sender_domain ON emails (sender_domain)",
+    # matches list_emails' default ORDER BY (urgent first, newest first) so
+    # pages come back pre-sorted instead of sorting the filtered set each time
+    "CREATE INDEX IF NOT EXISTS emails_urgent_recent ON emails "
+    "((CASE WHEN priority='Urgent' THEN 0 ELSE 1 END), received_at DESC)",
+    # the dashboard's most common filter; partial keeps it small
+    "CREATE INDEX IF NOT EXISTS emails_pending_recv ON emails (received_at DESC) "
+    "WHERE status='pending'",
+    # approval queue: rows awaiting review shrink out of the index as they
+    # are approved, so it stays tiny regardless of table size
+    "CREATE INDEX IF NOT EXISTS emails_unapproved ON emails (received_at DESC) "
+    "WHERE approved_at IS NULL",
+    # the model's __table_args__ composites only materialize on fresh
+    # databases (create_all skips existing tables); retrofit them here
+    "CREATE INDEX IF NOT EXISTS ix_emails_src_status_recv ON emails (source, status, received_at)",
+    "CREATE INDEX IF NOT EXISTS ix_emails_status_priority ON emails (status, priority)",
+    # drop duplicate (source, external_id) rows — keeping the oldest — so the
+    # unique dedupe index can build on databases that predate it
+    "DELETE FROM emails WHERE external_id IS NOT NULL AND id NOT IN "
+    "(SELECT MIN(id) FROM emails WHERE external_id IS NOT NULL GROUP BY source, external_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_emails_external_dedupe ON emails (source, external_id)",
+]
+
 def ensure_schema():  # simple additive migrations for sqlite
+    """Idempotent schema setup; called once from the app lifespan (not at import)."""
+    from ..models import email_model  # noqa: F401
+    Base.metadata.create_all(bind=engine)
     if not DATABASE_URL.startswith('sqlite'):
+        if engine.dialect.name == 'postgresql':
+            _ensure_pg_indexes()
         return
-    with engine.connect() as conn:
-        # create tables if not exist
-        from ..models import email_model  # noqa: F401
-        Base.metadata.create_all(bind=engine)
+    # single PRAGMA pass; all needed ALTERs run in one transaction
+    with engine.begin() as conn:
         cols = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info('emails')").fetchall()}
-        alter_needed = []
-        if 'approved_at' not in cols:
-            alter_needed.append("ALTER TABLE emails ADD COLUMN approved_at TIMESTAMP NULL")
-        if 'sent_at' not in cols:
-            alter_needed.append("ALTER TABLE emails ADD COLUMN sent_at TIMESTAMP NULL")
-        for stmt in alter_needed:
-            try:
+        for col, stmt in _ADDITIVE_COLUMNS.items():
+            if col not in cols:
                 conn.exec_driver_sql(stmt)
-            except Exception:
-                pass
+        for stmt in _POST_MIGRATE_SQL:
+            conn.exec_driver_sql(stmt)
+
+def _ensure_pg_indexes():
+    """Postgres-only search indexes, created idempotently at startup.
+
+    ILIKE with a leading wildcard (domain filter, fuzzy token search) is a
+    sequential scan without trigram support; pg_trgm GIN indexes let the
+    planner serve those predicates as index probes. Best-effort: a DB role
+    without CREATE EXTENSION rights just logs and keeps seq scans.
+    """
+    import logging
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for col in ('subject', 'body', 'sender'):
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS emails_{col}_trgm "
+                    f"ON emails USING gin ({col} gin_trgm_ops)"
+                )
+            # stored tsvector keeps full-text search off the per-row
+            # to_tsvector path; the GIN index makes q_search an index probe
+            conn.exec_driver_sql(
+                "ALTER TABLE emails ADD COLUMN IF NOT EXISTS search_tsv tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('english', "
+                "coalesce(subject,'') || ' ' || coalesce(body,'') || ' ' || coalesce(sender,''))) STORED"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS emails_search_tsv ON emails USING gin (search_tsv)"
+            )
+            # ordering-aligned index (INCLUDE makes the hot list columns
+            # index-only) plus a partial index for the pending dashboard
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS emails_urgent_recent ON emails "
+                "((CASE WHEN priority='Urgent' THEN 0 ELSE 1 END), received_at DESC) "
+                "INCLUDE (id, sender, subject, status, sentiment)"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS emails_pending_recv ON emails "
+                "(received_at DESC) WHERE status='pending'"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS emails_unapproved ON emails "
+                "(received_at DESC) WHERE approved_at IS NULL"
+            )
+            # retrofit the model's __table_args__ composites: create_all
+            # skips tables that already exist, so only fresh DBs have them
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_emails_src_status_recv "
+                "ON emails (source, status, received_at)"
+            )
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_emails_status_priority "
+                "ON emails (status, priority)"
+            )
+            # clear duplicates (keep the oldest row) before the unique index
+            conn.exec_driver_sql(
+                "DELETE FROM emails WHERE external_id IS NOT NULL AND id NOT IN "
+                "(SELECT MIN(id) FROM emails WHERE external_id IS NOT NULL "
+                "GROUP BY source, external_id)"
+            )
+            conn.exec_driver_sql(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_emails_external_dedupe "
+                "ON emails (source, external_id)"
+            )
+    except Exception:
+        logging.getLogger(__name__).warning("pg_trgm_setup_failed", exc_info=True)
 
-ensure_schema()
 
 def get_db():
     db = SessionLocal()
@@ -8,36 +8,39 @@ from .routers import emails, analytics
 from .services.retrievers import get_runtime_provider
 from .services.background_fetcher import start_background_fetch
 from sqlalchemy import func
-from .db.database import SessionLocal
+from sqlalchemy.orm import Session
+from fastapi import Depends
+from .db.database import get_db
 from .models.email_model import Email as EmailModel
 from .services.queue_worker import start_queue_worker
 from .routers.emails import schedule_rag_engine, rag_status
-from .db.database import Base, engine
+from .db.database import ensure_schema
 from .models import email_model  # noqa: F401
 from .core.logging import init_logging
-import logging, time, uuid
+import logging, os, time
 from fastapi import Request
 from fastapi.responses import StreamingResponse
-from .core.events import broadcaster
+from .core.events import broadcaster, KEEPALIVE_PAYLOAD
 from fastapi.responses import JSONResponse
-from asyncio import create_task, sleep
+from asyncio import get_running_loop
+
+try:  # orjson-backed responses: JSON encode runs in C instead of stdlib json
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as _DefaultResponse
+except ImportError:  # pragma: no cover
+    _DefaultResponse = JSONResponse
+
+KEEPALIVE_INTERVAL_S = 15
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_logging()
-    Base.metadata.create_all(bind=engine)
-    # lightweight migration for source/external_id columns (SQLite)
+    # create_all + all additive column migrations in one pass
     try:
-        with engine.connect() as conn:
-            rows = conn.exec_driver_sql("PRAGMA table_info(emails)").fetchall()
-            cols = [r[1] for r in rows]
-            if 'source' not in cols:
-                conn.exec_driver_sql("ALTER TABLE emails ADD COLUMN source TEXT DEFAULT 'unknown'")
-            if 'external_id' not in cols:
-                conn.exec_driver_sql("ALTER TABLE emails ADD COLUMN external_id TEXT")
+        ensure_schema()
     except Exception as e:
-        logging.getLogger(__name__).warning("source_column_migration_failed", exc_info=e)
+        logging.getLogger(__name__).warning("schema_migration_failed", exc_info=e)
     start_queue_worker()
     # Determine RAG mode from env (RAG_MODE=off|lazy|sync). Default lazy to avoid startup blocking.
     import os, logging
@@ -49,20 +52,33 @@ async def lifespan(app: FastAPI):
             start_background_fetch()
     except Exception:
         logging.getLogger(__name__).warning("failed_starting_fetcher_startup")
-    # Start keepalive task
-    async def _keepalive():
-        while True:
+    # Keepalive via self-rescheduling call_later: no coroutine wakeups when
+    # idle, publish skipped with zero subscribers, deadlines computed from
+    # loop.time() so the 15s cadence doesn't drift under backpressure.
+    loop = get_running_loop()
+    ka_handle = None
+    ka_deadline = loop.time() + KEEPALIVE_INTERVAL_S
+
+    def _keepalive_tick():
+        nonlocal ka_handle, ka_deadline
+        if broadcaster.has_subscribers():
             try:
-                broadcaster.publish("keepalive", "{}")
+                broadcaster.publish_raw(KEEPALIVE_PAYLOAD)
             except Exception:
                 pass
-            await sleep(15)
-    ka_task = create_task(_keepalive())
+        ka_deadline += KEEPALIVE_INTERVAL_S
+        now = loop.time()
+        if ka_deadline <= now:  # resync after a stalled loop
+            ka_deadline = now + KEEPALIVE_INTERVAL_S
+        ka_handle = loop.call_later(ka_deadline - now, _keepalive_tick)
+
+    ka_handle = loop.call_later(KEEPALIVE_INTERVAL_S, _keepalive_tick)
     yield
-    ka_task.cancel()
+    if ka_handle:
+        ka_handle.cancel()
     # Shutdown (add cleanup if needed)
 
-app = FastAPI(title="AI Support Email Assistant", lifespan=lifespan)
+app = FastAPI(title="AI Support Email Assistant", lifespan=lifespan, default_response_class=_DefaultResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -76,17 +92,25 @@ app.include_router(emails.router, prefix="/api/emails", tags=["emails"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"]) 
 
 
+# Health probes can fire every few seconds; COUNT(*) is an O(N) row-header
+# scan on SQLite, so serve a short-TTL cached value instead.
+_email_count_cache = {"ts": 0.0, "total": 0}
+EMAIL_COUNT_TTL_S = 5.0
+
 @app.get("/health")
-async def health():
+async def health(db: Session = Depends(get_db)):
     # Lightweight counts for debugging provider status
-    db = SessionLocal()
-    total = db.query(func.count(EmailModel.id)).scalar() or 0
-    db.close()
-    return {"status": "ok", "rag": rag_status(), "provider": get_runtime_provider(), "emails": total}
+    now = time.monotonic()
+    if now - _email_count_cache["ts"] > EMAIL_COUNT_TTL_S:
+        _email_count_cache["total"] = db.query(func.count(EmailModel.id)).scalar() or 0
+        _email_count_cache["ts"] = now
+    return {"status": "ok", "rag": rag_status(), "provider": get_runtime_provider(), "emails": _email_count_cache["total"]}
 
 @app.middleware("http")
 async def timing_logger(request: Request, call_next):
-    trace_id = request.headers.get("X-Trace-Id", str(uuid.uuid4())[:8])
+    # Default arg would run the RNG even when the header is present; generate
+    # lazily, and with os.urandom rather than full UUID construction.
+    trace_id = request.headers.get("X-Trace-Id") or os.urandom(4).hex()
     start = time.perf_counter()
     try:
         response = await call_next(request)
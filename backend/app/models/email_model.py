@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from ..db.database import Base
 from datetime import datetime, timezone
 
@@ -6,15 +6,27 @@ class Email(Base):
     __tablename__ = 'emails'
     id = Column(Integer, primary_key=True, index=True)
     sender = Column(String, index=True)
+    # lowercased part after '@', denormalized so the domain filter is an
+    # indexed equality instead of a double wildcard ILIKE over sender
+    sender_domain = Column(String, index=True, nullable=True)
     subject = Column(String, index=True)
     body = Column(Text)
     received_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     sentiment = Column(String, index=True)
     priority = Column(String, index=True)
     auto_response = Column(Text)
-    status = Column(String, default='pending', index=True)
+    status = Column(String, default='pending')
     approved_at = Column(DateTime, nullable=True)
     sent_at = Column(DateTime, nullable=True)
-    source = Column(String, default='unknown', index=True)
+    source = Column(String, default='unknown')
     # external_id stores provider-specific unique identifier (e.g., Gmail UID) for stronger dedupe
     external_id = Column(String, nullable=True, index=True)
+
+    # Composite indexes cover analytics_summary (source+status filters over time)
+    # and worker lookups; the single-column source/status indexes they replace
+    # only added write amplification on insert.
+    __table_args__ = (
+        Index("ix_emails_src_status_recv", "source", "status", "received_at"),
+        Index("ix_emails_status_priority", "status", "priority"),
+        Index("ix_emails_external_dedupe", "source", "external_id", unique=True),
+    )
@@ -1,6 +1,10 @@
+import time
+
 from fastapi import APIRouter, Depends
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from ..db.database import get_db
+from ..models.email_model import Email
 from ..services.email_service import analytics_summary
 from ..services.retrievers import get_runtime_provider
 from fastapi import Query
@@ -9,6 +13,12 @@ from fastapi import Query
 
 router = APIRouter()
 
+# Dashboard polls hit /summary far more often than emails arrive; cache the
+# aggregate keyed on max(id) (bumped by inserts) plus a one-minute time bucket
+# so the last_24h window can't go stale on an idle table.
+_summary_cache: dict[tuple, dict] = {}
+_SUMMARY_CACHE_MAX = 32
+
 @router.get("/summary")
 def summary(db: Session = Depends(get_db), source: str | None = Query(None)):
     runtime = get_runtime_provider()
@@ -16,7 +26,16 @@ def summary(db: Session = Depends(get_db), source: str | None = Query(None)):
     exclude = None
     if not src and runtime == 'gmail':
         exclude = ['demo', 'unknown']
-    return analytics_summary(db, source=src, exclude_sources=exclude)
+    marker = db.query(func.max(Email.id)).scalar() or 0  # O(1) on the pk index
+    key = (src, tuple(exclude or ()), marker, int(time.time() // 60))
+    cached = _summary_cache.get(key)
+    if cached is not None:
+        return cached
+    result = analytics_summary(db, source=src, exclude_sources=exclude)
+    if len(_summary_cache) >= _SUMMARY_CACHE_MAX:
+        _summary_cache.clear()
+    _summary_cache[key] = result
+    return result
 
 @router.get("/ai")
 def ai_status():
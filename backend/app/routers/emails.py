@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Body
+from fastapi.responses import StreamingResponse
 from typing import List, Optional, Any, Dict
 from sqlalchemy.orm import Session
-from ..schemas.email import EmailOut, EmailCreate, ExtractedInfo
+from ..schemas.email import EmailCreate
+from sqlalchemy import case, delete, func, text, update
+from concurrent.futures import ThreadPoolExecutor
+from ..models.email_model import Email
 from ..services.email_service import (
     create_email,
     list_emails as list_db_emails,
@@ -10,32 +14,58 @@ from ..services.email_service import (
     save_auto_response,
     approve_email,
     mark_sent,
+    bulk_insert_emails,
+    existing_external_ids,
+    existing_email_pairs,
 )
 from ..services.background_fetcher import start_background_fetch, stop_background_fetch, get_last_fetch_summary
 from ..services.retrievers import set_runtime_provider, get_runtime_provider
-from ..services.retrievers import fetch_any, gmail_diag
+from ..services.retrievers import fetch_any, gmail_diag, gmail_ping
 from ..db.database import get_db
-from ..services.nlp import analyze_sentiment, determine_priority, extract_info
-from ..services.auto_responder import generate_response
+from ..services.nlp_cache import cached_analyze as analyze_sentiment, cached_determine as determine_priority, cached_extract as extract_info, score_email
+from ..services.auto_responder import generate_response, generate_response_stream
 from ..services.auto_responder import ai_diagnostics, test_llm
 from ..services.dataset_loader import load_dataset
-from ..security.api_key import get_api_key
+from ..services import semantic_cache
+from ..security.api_key import get_api_key, reload_auth
 from ..core.events import broadcaster
 from email.utils import parsedate_to_datetime
+from functools import lru_cache
 from datetime import datetime, timezone
 
+
+@lru_cache(maxsize=512)
+def _parse_date_cached(s: str):
+    # Date headers repeat across messages in a conversation; cache hits skip
+    # the parsedate tuple allocation entirely.
+    return parsedate_to_datetime(s)
+
+
 def _coerce_received(value):
     if isinstance(value, datetime):
         return value
     if isinstance(value, str):
         try:
-            dt = parsedate_to_datetime(value)
+            dt = _parse_date_cached(value)
             if dt:
                 return dt
-        except Exception:
+        except (TypeError, ValueError, IndexError):
             pass
     return datetime.now(timezone.utc)
-import os, threading, logging
+import os, threading, logging, time
+
+try:  # optional fast serializer (already used by core.logging)
+    import orjson  # type: ignore
+    from fastapi.responses import ORJSONResponse
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # pragma: no cover
+    import json
+    ORJSONResponse = None  # type: ignore
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(',', ':'), default=str)
 
 # Optional RAG engine (heavy deps). Only active if ML requirements installed.
 try:  # pragma: no cover - import guard
@@ -53,23 +83,34 @@ rag_state = {
     "status": "disabled"  # disabled | loading | ready | error
 }
 
+# Seed knowledge base; ensure_built digests these, so editing the list
+# triggers a one-time re-embed on next startup.
+_SEED_KB_DOCS = [
+    "If a user cannot access their account, advise password reset or SSO health check.",
+    "Critical outages should be escalated to the on-call engineer within 15 minutes.",
+    "For billing queries, direct the customer to the billing portal and create a ticket if unresolved."
+]
+
 # Startup is now handled via app lifespan in main.py; router exposes an init function.
 def init_rag_engine():  # pragma: no cover
-    """Build the RAG engine (blocking). Caller is responsible for setting rag_state beforehand."""
+    """Build or load the RAG engine (blocking). Caller is responsible for setting rag_state beforehand."""
     global rag_engine, rag_state
     if RagEngine is None:
         rag_state["status"] = "disabled"
         return
     try:
         instance = RagEngine()
-        instance.build([
-            "If a user cannot access their account, advise password reset or SSO health check.",
-            "Critical outages should be escalated to the on-call engineer within 15 minutes.",
-            "For billing queries, direct the customer to the billing portal and create a ticket if unresolved."
-        ])
+        # Embeds only on first launch or when the seed docs change; otherwise
+        # the persisted index loaded by RagEngine() is reused as-is.
+        built = instance.ensure_built(_SEED_KB_DOCS)
         rag_engine = instance
         rag_state["status"] = "ready"
-        logging.getLogger(__name__).info("RAG engine ready", extra={"component":"rag","status":"ready"})
+        # share the loaded encoder with the semantic reply cache (opt-in)
+        semantic_cache.set_embedder(instance._encode)
+        logging.getLogger(__name__).info(
+            "RAG engine ready",
+            extra={"component": "rag", "status": "ready", "built": built, "size": instance.size}
+        )
     except Exception as e:
         rag_engine = None
         rag_state["status"] = "error"
@@ -103,40 +144,47 @@ def schedule_rag_engine(mode: str):  # pragma: no cover
                 pass
         threading.Thread(target=_runner, name="rag-init", daemon=True).start()
 
+NLP_RECOMPUTE_WORKERS = min(8, os.cpu_count() or 1)  # regex C code releases the GIL
+
+def _rescore_email(row):
+    email_id, body, old_sent, old_pri = row
+    return email_id, body, old_sent, old_pri, analyze_sentiment(body), determine_priority(body)
+
 @router.post("/maintenance/recompute", dependencies=[Depends(get_api_key)])
 def maintenance_recompute(limit_details: int = 50, include_details: bool = True, db: Session = Depends(get_db)):
     """Re-run sentiment/priority and provide fresh extraction preview for all emails.
 
     Returns up to `limit_details` detailed extraction objects (not persisted) so the frontend can refresh caches.
     """
-    from ..models.email_model import Email
-    emails = db.query(Email).all()
-    changed = 0
+    # Stream (id, body) tuples instead of materializing full ORM instances,
+    # fan the NLP out across threads, then push all changes in one bulk UPDATE.
+    rows = db.query(Email.id, Email.body, Email.sentiment, Email.priority).yield_per(500)
+    total = 0
+    changed: List[Dict[str, Any]] = []
     details = []
-    for i, e in enumerate(emails):
-        new_sent = analyze_sentiment(e.body)
-        new_pri = determine_priority(e.body)
-        if new_sent != e.sentiment or new_pri != e.priority:
-            e.sentiment = new_sent
-            e.priority = new_pri
-            changed += 1
-        if include_details and i < limit_details:
-            phones, alt_emails, keywords, requested_actions, sentiment_terms = extract_info(e.body)
-            details.append({
-                "id": e.id,
-                "sentiment": e.sentiment,
-                "priority": e.priority,
-                "extracted": {
-                    "phone_numbers": phones,
-                    "alt_emails": alt_emails,
-                    "keywords": keywords,
-                    "requested_actions": requested_actions,
-                    "sentiment_terms": sentiment_terms
-                }
-            })
+    with ThreadPoolExecutor(max_workers=NLP_RECOMPUTE_WORKERS) as pool:
+        for email_id, body, old_sent, old_pri, new_sent, new_pri in pool.map(_rescore_email, rows, chunksize=64):
+            total += 1
+            if new_sent != old_sent or new_pri != old_pri:
+                changed.append({"id": email_id, "sentiment": new_sent, "priority": new_pri})
+            if include_details and len(details) < limit_details:
+                phones, alt_emails, keywords, requested_actions, sentiment_terms = extract_info(body)
+                details.append({
+                    "id": email_id,
+                    "sentiment": new_sent,
+                    "priority": new_pri,
+                    "extracted": {
+                        "phone_numbers": phones,
+                        "alt_emails": alt_emails,
+                        "keywords": keywords,
+                        "requested_actions": requested_actions,
+                        "sentiment_terms": sentiment_terms
+                    }
+                })
     if changed:
+        db.bulk_update_mappings(Email, changed)
         db.commit()
-    return {"total": len(emails), "changed_sentiment_or_priority": changed, "details_returned": len(details), "details": details}
+    return {"total": total, "changed_sentiment_or_priority": len(changed), "details_returned": len(details), "details": details}
 
 
 @router.post("/maintenance/reset-dataset", dependencies=[Depends(get_api_key)])
@@ -151,7 +199,6 @@ def maintenance_reset_dataset(
         generate_responses: if True, queue auto-response generation for each loaded email.
         dataset_path: optional override path to CSV (defaults to env DATASET_CSV_PATH or bundled sample name).
     """
-    import os
     path = dataset_path or os.getenv("DATASET_CSV_PATH", "68b1acd44f393_Sample_Support_Emails_Dataset.csv")
     try:
         summary = load_dataset(db, path, generate_responses=generate_responses, wipe=True)
@@ -165,7 +212,6 @@ def maintenance_strip_html(limit: int = 500, ids: str | None = None, db: Session
     - limit: scan newest N (ignored if ids provided)
     - ids: comma-separated list of specific email IDs to force reprocess
     """
-    from ..models.email_model import Email
     import re, html as _html
     tag_re = re.compile(r'<[^>]+>')
     rows = []
@@ -198,9 +244,67 @@ def maintenance_strip_html(limit: int = 500, ids: str | None = None, db: Session
     return {"scanned": len(rows), "changed": changed, "ids": ids.split(',') if ids else None}
 
 
+# Canonical filter values: only two priority buckets for now, so any
+# non-urgent alias maps to 'Not urgent'; sentiment keys on the first three
+# letters (pos/neg/neu).
+_PRIORITY_CANON = {
+    'urgent': 'Urgent',
+    'not urgent': 'Not urgent',
+    'normal': 'Not urgent',
+    'low': 'Not urgent',
+    'high': 'Not urgent',
+}
+_SENT_CANON = {'pos': 'Positive', 'neg': 'Negative', 'neu': 'Neutral'}
+
+
 def rag_status():  # pragma: no cover
     return {"mode": rag_state["mode"], "status": rag_state["status"], "available": rag_engine is not None and rag_state["status"] == "ready"}
 
+
+def _publish_updated(record):
+    """Broadcast an email_updated event; C-serialized and quote-safe, unlike
+    the hand-built f-string JSON this replaces."""
+    try:
+        broadcaster.publish("email_updated", _dumps({"id": record.id, "status": record.status}))
+    except Exception:
+        pass
+
+
+def _extracted(sentiment=None, priority=None, phones=(), alt_emails=(), keywords=(), requested_actions=(), sentiment_terms=()) -> Dict[str, Any]:
+    return {
+        "phone_numbers": list(phones),
+        "alt_emails": list(alt_emails),
+        "sentiment": sentiment,
+        "priority": priority,
+        "keywords": list(keywords),
+        "requested_actions": list(requested_actions),
+        "sentiment_terms": list(sentiment_terms),
+    }
+
+
+def _build_email_out(r, extracted: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Hand-build the EmailOut response dict without Pydantic validation.
+
+    Single serializer for every email-returning route (list, stream, ingest,
+    detail, regenerate, response edit, resolve, approve, send): rows come
+    straight from our ORM, so re-validating every field is pure overhead.
+    Keep the shape in sync with schemas.EmailOut.
+    """
+    return {
+        "id": r.id,
+        "sender": r.sender,
+        "subject": r.subject,
+        "body": r.body,
+        "received_at": r.received_at,
+        "source": getattr(r, 'source', None),
+        "external_id": getattr(r, 'external_id', None),
+        "sentiment": r.sentiment,
+        "priority": r.priority,
+        "auto_response": r.auto_response,
+        "extracted": extracted if extracted is not None else _extracted(sentiment=r.sentiment, priority=r.priority),
+        "status": r.status,
+    }
+
 @router.get("/")
 def list_emails(
     db: Session = Depends(get_db),
@@ -211,6 +315,7 @@ def list_emails(
     search: Optional[str] = Query(None, description="Alias for q"),
     query: Optional[str] = Query(None, description="Alias for q"),
     domain: Optional[str] = Query(None, description="Filter by sender domain (example.com, @example.com, or fragment)"),
+    fuzzy: bool = Query(False, description="Match each token of q independently (any order/field)"),
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
     source: Optional[str] = Query(None, description="Filter by source (demo/gmail/imap)"),
@@ -219,22 +324,11 @@ def list_emails(
     # Accept multiple aliases for search
     if not q:
         q = search or query
-    # normalize priority filter to canonical values
+    # normalize filters to stored canonical values (single dict lookup each)
     if priority:
-        if priority.lower() == 'urgent':
-            priority = 'Urgent'
-        elif priority.lower() in ['not urgent','normal','low','high']:
-            # for now only two buckets; treat any non urgent as 'Not urgent'
-            priority = 'Not urgent'
-    # normalize sentiment to stored canonical capitalization
+        priority = _PRIORITY_CANON.get(priority.lower(), priority)
     if sentiment:
-        sl = sentiment.lower()
-        if sl.startswith('pos'):
-            sentiment = 'Positive'
-        elif sl.startswith('neg'):
-            sentiment = 'Negative'
-        elif sl.startswith('neu'):
-            sentiment = 'Neutral'
+        sentiment = _SENT_CANON.get(sentiment.lower()[:3], sentiment)
     # Decide source filtering strategy
     runtime_provider = get_runtime_provider()
     exclude_sources = None
@@ -260,32 +354,61 @@ def list_emails(
         limit=limit,
         offset=offset,
         source=source_filter,
-        exclude_sources=exclude_sources
+        exclude_sources=exclude_sources,
+        fuzzy=fuzzy
     )
-    items: List[Dict[str, Any]] = []
-    for r in records:
-        items.append(EmailOut(
-            id=r.id,
-            sender=r.sender,
-            subject=r.subject,
-            body=r.body,
-            received_at=r.received_at,
-            source=getattr(r, 'source', None),
-            external_id=getattr(r, 'external_id', None),
-            sentiment=r.sentiment,
-            priority=r.priority,
-            auto_response=r.auto_response,
-            status=r.status,
-            extracted=ExtractedInfo(sentiment=r.sentiment, priority=r.priority)
-        ).model_dump())
-    return {"total": total, "count": len(items), "items": items, "limit": limit, "offset": offset}
+    items = [_build_email_out(r) for r in records]
+    payload = {"total": total, "count": len(items), "items": items, "limit": limit, "offset": offset}
+    if ORJSONResponse is not None:
+        # Returning the response directly skips FastAPI's jsonable_encoder
+        # walk over every row; orjson serializes datetimes natively.
+        return ORJSONResponse(payload)
+    return payload
+
+@router.get("/stream.ndjson")
+def stream_emails(
+    db: Session = Depends(get_db),
+    status: Optional[str] = Query(None),
+    priority: Optional[str] = Query(None),
+    sentiment: Optional[str] = Query(None),
+    source: Optional[str] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """ND-JSON stream of emails, one object per line.
+
+    Rows are serialized as the ORM yields them (yield_per), so memory stays
+    constant regardless of limit and the frontend can render before the last
+    row is written. The regular JSON list endpoint is unchanged.
+    """
+    if priority:
+        priority = _PRIORITY_CANON.get(priority.lower(), priority)
+    if sentiment:
+        sentiment = _SENT_CANON.get(sentiment.lower()[:3], sentiment)
+    q = db.query(Email)
+    if status:
+        q = q.filter(Email.status == status)
+    if priority:
+        q = q.filter(Email.priority == priority)
+    if sentiment:
+        q = q.filter(Email.sentiment == sentiment)
+    if source:
+        q = q.filter(Email.source == source)
+    # same ordering as the list endpoint: urgent first, then newest
+    priority_order = case((Email.priority == 'Urgent', 0), else_=1)
+    rows = q.order_by(priority_order, Email.received_at.desc()).limit(limit).yield_per(100)
+
+    def gen():
+        for r in rows:
+            yield _dumps(_build_email_out(r)) + "\n"
+
+    return StreamingResponse(gen(), media_type='application/x-ndjson')
 
 @router.post("/kb/docs", dependencies=[Depends(get_api_key)])
 def add_kb_doc(text: str = Body(..., embed=True)):
     if rag_engine is None:
         raise HTTPException(status_code=400, detail="RAG engine not available")
     rag_engine.add_doc(text)
-    return {"status": "added", "size": len(rag_engine.store.meta)}
+    return {"status": "added", "size": rag_engine.size}
 
 @router.get("/kb/docs")
 def list_kb_docs():
@@ -293,64 +416,41 @@ def list_kb_docs():
         return {"docs": []}
     return {"docs": rag_engine.store.meta, "size": len(rag_engine.store.meta)}
 
-@router.post("/ingest", response_model=EmailOut, dependencies=[Depends(get_api_key)])
+@router.post("/ingest", response_model=None, dependencies=[Depends(get_api_key)])
 def ingest_email(payload: EmailCreate, db: Session = Depends(get_db)):
-    sentiment = analyze_sentiment(payload.body)
-    priority = determine_priority(payload.body)
-    phones, alt_emails, keywords, requested_actions, sentiment_terms = extract_info(payload.body)
+    # the three NLP passes are independent; run them on the shared pool
+    sentiment, priority, (phones, alt_emails, keywords, requested_actions, sentiment_terms) = score_email(payload.body)
     # Queue-based deferred auto-response
     record = create_email(db, payload, sentiment, priority, auto_response=None)
     from ..services.queue_worker import enqueue_email  # local import to avoid cycle
     enqueue_email(record.id, priority)
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
-        sentiment=record.sentiment,
-        priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(
-            phone_numbers=phones,
-            alt_emails=alt_emails,
-            sentiment=sentiment,
-            priority=priority,
-            keywords=keywords,
-            requested_actions=requested_actions,
-            sentiment_terms=sentiment_terms
-        )
-    )
-
-@router.get("/{email_id}", response_model=EmailOut)
+    return _build_email_out(record, _extracted(
+        sentiment=sentiment,
+        priority=priority,
+        phones=phones,
+        alt_emails=alt_emails,
+        keywords=keywords,
+        requested_actions=requested_actions,
+        sentiment_terms=sentiment_terms,
+    ))
+
+@router.get("/{email_id}", response_model=None)
 def get_single_email(email_id: int, db: Session = Depends(get_db)):
     record = get_email(db, email_id)
     if not record:
         raise HTTPException(status_code=404, detail="Email not found")
     phones, alt_emails, keywords, requested_actions, sentiment_terms = extract_info(record.body)
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
+    return _build_email_out(record, _extracted(
         sentiment=record.sentiment,
         priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(
-            phone_numbers=phones,
-            alt_emails=alt_emails,
-            sentiment=record.sentiment,
-            priority=record.priority,
-            keywords=keywords,
-            requested_actions=requested_actions,
-            sentiment_terms=sentiment_terms
-        )
-    )
-
-@router.post("/{email_id}/regenerate", response_model=EmailOut, dependencies=[Depends(get_api_key)])
+        phones=phones,
+        alt_emails=alt_emails,
+        keywords=keywords,
+        requested_actions=requested_actions,
+        sentiment_terms=sentiment_terms,
+    ))
+
+@router.post("/{email_id}/regenerate", response_model=None, dependencies=[Depends(get_api_key)])
 def regenerate_response(email_id: int, db: Session = Depends(get_db)):
     record = get_email(db, email_id)
     if not record:
@@ -370,62 +470,73 @@ def regenerate_response(email_id: int, db: Session = Depends(get_db)):
         except Exception:
             pass
     phones, alt_emails, keywords, requested_actions, sentiment_terms = extract_info(record.body)
-    try:
-        broadcaster.publish("email_updated", f"{{\"id\":{record.id},\"status\":\"{record.status}\"}}")
-    except Exception:
-        pass
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
+    _publish_updated(record)
+    return _build_email_out(record, _extracted(
         sentiment=record.sentiment,
         priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(
-            phone_numbers=phones,
-            alt_emails=alt_emails,
-            sentiment=record.sentiment,
-            priority=record.priority,
-            keywords=keywords,
-            requested_actions=requested_actions,
-            sentiment_terms=sentiment_terms
-        )
-    )
+        phones=phones,
+        alt_emails=alt_emails,
+        keywords=keywords,
+        requested_actions=requested_actions,
+        sentiment_terms=sentiment_terms,
+    ))
+
+@router.post("/{email_id}/regenerate/stream", dependencies=[Depends(get_api_key)])
+def regenerate_response_stream(email_id: int, db: Session = Depends(get_db)):
+    """Streaming variant of regenerate: flushes reply text as the LLM emits
+    it (client sees first tokens instead of waiting for the full draft), then
+    persists the assembled reply and broadcasts the update."""
+    record = get_email(db, email_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Email not found")
+    rag_results = []
+    if rag_engine:
+        rag_results = rag_engine.retrieve(record.subject + "\n" + record.body)
+    # capture scalars now: the generator runs after this function returns,
+    # when the request-scoped session is closed and `record` is detached
+    subject, body, sentiment, priority = record.subject, record.body, record.sentiment, record.priority
+
+    def _streamer():
+        pieces = []
+        for piece in generate_response_stream(subject, body, sentiment, priority, rag_results):
+            pieces.append(piece)
+            yield piece
+        full = "".join(pieces).strip()
+        if not full:
+            return
+        # same situation as BackgroundTasks (see _do_single_fetch_bg): the
+        # body streams after the Depends(get_db) session exits, so persist
+        # through a dedicated session and a fresh row.
+        from ..db.database import SessionLocal
+        sdb = SessionLocal()
+        try:
+            fresh = get_email(sdb, email_id)
+            if fresh:
+                save_auto_response(sdb, fresh, full)
+                _publish_updated(fresh)
+        finally:
+            sdb.close()
+
+    return StreamingResponse(_streamer(), media_type="text/plain; charset=utf-8")
+
 
-@router.put("/{email_id}/response", response_model=EmailOut, dependencies=[Depends(get_api_key)])
+@router.put("/{email_id}/response", response_model=None, dependencies=[Depends(get_api_key)])
 def update_response(email_id: int, new_text: str, db: Session = Depends(get_db)):
     record = get_email(db, email_id)
     if not record:
         raise HTTPException(status_code=404, detail="Email not found")
     save_auto_response(db, record, new_text, mark_responded=True)
     phones, alt_emails, keywords, requested_actions, sentiment_terms = extract_info(record.body)
-    try:
-        broadcaster.publish("email_updated", f"{{\"id\":{record.id},\"status\":\"{record.status}\"}}")
-    except Exception:
-        pass
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
+    _publish_updated(record)
+    return _build_email_out(record, _extracted(
         sentiment=record.sentiment,
         priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(
-            phone_numbers=phones,
-            alt_emails=alt_emails,
-            sentiment=record.sentiment,
-            priority=record.priority,
-            keywords=keywords,
-            requested_actions=requested_actions,
-            sentiment_terms=sentiment_terms
-        )
-    )
+        phones=phones,
+        alt_emails=alt_emails,
+        keywords=keywords,
+        requested_actions=requested_actions,
+        sentiment_terms=sentiment_terms,
+    ))
 
 @router.post("/fetch/start", dependencies=[Depends(get_api_key)])
 def start_fetch():
@@ -442,41 +553,97 @@ def _do_single_fetch(db: Session):
         mails = fetch_any(limit=10)
         created = 0
         if mails:
-            from ..services.email_service import create_email, email_exists
-            from ..schemas.email import EmailCreate
+            provider = get_runtime_provider()
+            # Two set-building queries for the whole batch instead of one or
+            # two existence SELECTs per fetched message.
+            for m in mails:
+                m['_recv'] = _coerce_received(m.get('received_at'))
+            seen_ext = existing_external_ids(db, [m['external_id'] for m in mails if m.get('external_id')])
+            seen_pairs = existing_email_pairs(db, [(m['sender'], m['subject'], m['_recv']) for m in mails if not m.get('external_id')])
+            rows = []
             for m in mails:
-                sentiment = analyze_sentiment(m['body'])
-                priority = determine_priority(m['body'])
-                # Defer AI generation to worker to avoid bursts and ensure consistency
-                auto_resp = None
-                recv = _coerce_received(m.get('received_at'))
-                from ..services.email_service import email_exists_external, email_exists
                 ext_id = m.get('external_id')
-                if ext_id and email_exists_external(db, ext_id):
-                    continue
-                if not ext_id and email_exists(db, m['sender'], m['subject'], recv):
-                    continue
-                rec = create_email(db, EmailCreate(sender=m['sender'], subject=m['subject'], body=m['body'], received_at=recv), sentiment, priority, auto_resp, source=get_runtime_provider(), external_id=ext_id)
+                if ext_id:
+                    if ext_id in seen_ext:
+                        continue
+                    seen_ext.add(ext_id)  # also dedupes within the batch
+                else:
+                    triple = (m['sender'], m['subject'], m['_recv'])
+                    if triple in seen_pairs:
+                        continue
+                    seen_pairs.add(triple)  # also dedupes within the batch
+                rows.append({
+                    'sender': m['sender'],
+                    'subject': m['subject'],
+                    'body': m['body'],
+                    'received_at': m['_recv'],
+                    'sentiment': analyze_sentiment(m['body']),
+                    'priority': determine_priority(m['body']),
+                    'source': provider,
+                    'external_id': ext_id,
+                })
+            pre_max = db.query(func.max(Email.id)).scalar() or 0
+            # Defer AI generation to worker to avoid bursts and ensure consistency
+            created = bulk_insert_emails(db, rows)
+            if created:
                 try:
                     from ..services.queue_worker import enqueue_email
-                    enqueue_email(rec.id, priority)
+                    for email_id, priority in db.query(Email.id, Email.priority).filter(Email.id > pre_max):
+                        enqueue_email(email_id, priority)
                 except Exception:
                     pass
-                created += 1
         return {"fetched": len(mails), "inserted": created}
     except Exception as e:
         import traceback
         return {"error": str(e), "trace": traceback.format_exc().splitlines()[-3:]}
 
+# Run-once fetches block the client for a full IMAP round-trip (tens of
+# seconds on slow links), so schedule them via BackgroundTasks and let the
+# caller poll /fetch/jobs/{id}. Job states live in a small in-memory dict.
+_fetch_jobs: Dict[str, Dict[str, Any]] = {}
+_FETCH_JOBS_MAX = 100
+
+def _new_fetch_job() -> str:
+    job_id = os.urandom(4).hex()
+    if len(_fetch_jobs) >= _FETCH_JOBS_MAX:
+        _fetch_jobs.clear()
+    _fetch_jobs[job_id] = {"status": "running"}
+    return job_id
+
+def _do_single_fetch_bg(job_id: str):
+    # BackgroundTasks run after the response; the request-scoped session is
+    # closed by then, so open a dedicated one.
+    from ..db.database import SessionLocal
+    db = SessionLocal()
+    try:
+        result = _do_single_fetch(db)
+        _fetch_jobs[job_id] = {"status": "error" if 'error' in result else "done", "result": result}
+    except Exception as e:
+        _fetch_jobs[job_id] = {"status": "error", "error": str(e)}
+    finally:
+        db.close()
+
 @router.post("/fetch/run-once", dependencies=[Depends(get_api_key)])
-def run_single_fetch(db: Session = Depends(get_db)):
-    """Trigger a single immediate retrieval cycle (POST)."""
-    return _do_single_fetch(db)
+def run_single_fetch(background_tasks: BackgroundTasks):
+    """Schedule a single immediate retrieval cycle; poll /fetch/jobs/{job_id} for the result."""
+    job_id = _new_fetch_job()
+    background_tasks.add_task(_do_single_fetch_bg, job_id)
+    return {"status": "scheduled", "job_id": job_id}
 
 @router.get("/fetch/run-once", dependencies=[Depends(get_api_key)])
-def run_single_fetch_get(db: Session = Depends(get_db)):
+def run_single_fetch_get(background_tasks: BackgroundTasks):
     """Convenience GET variant for manual browser testing."""
-    return _do_single_fetch(db)
+    job_id = _new_fetch_job()
+    background_tasks.add_task(_do_single_fetch_bg, job_id)
+    return {"status": "scheduled", "job_id": job_id}
+
+@router.get("/fetch/jobs/{job_id}", dependencies=[Depends(get_api_key)])
+def fetch_job_status(job_id: str):
+    """Status/result of a previously scheduled run-once fetch."""
+    job = _fetch_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job_id, **job}
 
 @router.get("/fetch/status", dependencies=[Depends(get_api_key)])
 def fetch_status():
@@ -486,8 +653,9 @@ def fetch_status():
 @router.get("/fetch/diag", dependencies=[Depends(get_api_key)])
 def fetch_diag():
     """Detailed Gmail diagnostic info (does not expose secrets)."""
-    if get_runtime_provider() != 'gmail':
-        return {"provider": get_runtime_provider(), "note": "switch to gmail for gmail diagnostics"}
+    provider = get_runtime_provider()
+    if provider != 'gmail':
+        return {"provider": provider, "note": "switch to gmail for gmail diagnostics"}
     return {
         "provider": "gmail",
         "login_ok": gmail_diag.last_login_ok,
@@ -499,26 +667,38 @@ def fetch_diag():
         "has_app_password": bool(os.getenv('GMAIL_APP_PASSWORD')),
     }
 
+# Dashboards poll /source on every render; COUNT(*) is an O(N) scan, so serve
+# a planner estimate on Postgres and a short-TTL cached exact count elsewhere
+# (same pattern as the /health email counter).
+_source_count_cache = {"ts": 0.0, "total": 0}
+SOURCE_COUNT_TTL_S = 5.0
+
 @router.get("/source", dependencies=[Depends(get_api_key)])
 def source_info(db: Session = Depends(get_db)):
-    from ..models.email_model import Email
-    total = db.query(Email).count()
+    if db.get_bind().dialect.name == 'postgresql':
+        # reltuples drifts until the next ANALYZE, which is fine for a ticker
+        total = int(db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname='emails'")).scalar() or 0)
+    else:
+        now = time.monotonic()
+        if now - _source_count_cache["ts"] > SOURCE_COUNT_TTL_S:
+            _source_count_cache["total"] = db.query(func.count(Email.id)).scalar() or 0
+            _source_count_cache["ts"] = now
+        total = _source_count_cache["total"]
     return {"provider": get_runtime_provider(), "total": total}
 
 @router.post("/purge/demo", dependencies=[Depends(get_api_key)])
 def purge_demo(db: Session = Depends(get_db)):
-    from ..models.email_model import Email
-    removed = db.query(Email).filter(Email.source=='demo').delete()
+    # Core delete: one DELETE statement, no identity-map synchronization pass
+    res = db.execute(delete(Email).where(Email.source == 'demo').execution_options(synchronize_session=False))
     db.commit()
-    return {"removed": removed}
+    return {"removed": res.rowcount}
 
 @router.post("/purge/non-gmail", dependencies=[Depends(get_api_key)])
 def purge_non_gmail(db: Session = Depends(get_db)):
     """Remove all emails whose source is NOT 'gmail'."""
-    from ..models.email_model import Email
-    removed = db.query(Email).filter(Email.source != 'gmail').delete()
+    res = db.execute(delete(Email).where(Email.source != 'gmail').execution_options(synchronize_session=False))
     db.commit()
-    return {"removed": removed}
+    return {"removed": res.rowcount}
 
 @router.get("/ai/diag", dependencies=[Depends(get_api_key)])
 def ai_diag():
@@ -530,10 +710,9 @@ def ai_test():
 
 @router.post("/maintenance/tag-unknown-as-demo", dependencies=[Depends(get_api_key)])
 def tag_unknown_as_demo(db: Session = Depends(get_db)):
-    from ..models.email_model import Email
-    updated = db.query(Email).filter(Email.source=='unknown').update({"source": "demo"})
+    res = db.execute(update(Email).where(Email.source == 'unknown').values(source='demo').execution_options(synchronize_session=False))
     db.commit()
-    return {"updated": updated}
+    return {"updated": res.rowcount}
 
 # Unprotected convenience endpoint if local auth disabled
 @router.get("/fetch/run-once-open")
@@ -542,8 +721,14 @@ def run_once_open(db: Session = Depends(get_db)):
 
 @router.get("/fetch/ping-gmail", dependencies=[Depends(get_api_key)])
 def ping_gmail():
-    """Quick network reachability check to imap.gmail.com:993."""
-    import socket, time
+    """IMAP NOOP over the pooled Gmail session (no TLS handshake per probe).
+
+    Falls back to a raw TCP reachability check when no credentials are set.
+    """
+    result = gmail_ping()
+    if result.get("error") != "missing_credentials":
+        return result
+    import socket
     host, port = 'imap.gmail.com', 993
     start = time.perf_counter()
     try:
@@ -557,16 +742,21 @@ def ping_gmail():
 @router.get("/auth/debug")
 def auth_debug(expected: bool = True):
     """Open endpoint to show whether SUPPORT_API_KEY is set and what header name to use."""
-    import os
     exp = os.getenv('SUPPORT_API_KEY')
     return {"api_key_required": bool(exp), "header_name": "X-API-Key", "have_env_value": bool(exp)}
 
+@router.post("/maintenance/reload-auth", dependencies=[Depends(get_api_key)])
+def maintenance_reload_auth():
+    """Re-read SUPPORT_API_KEY/ALLOW_UNAUTH_LOCAL so ops can rotate without restart."""
+    reload_auth()
+    return {"status": "reloaded"}
+
 @router.get("/fetch/mode", dependencies=[Depends(get_api_key)])
 def get_fetch_mode():
     return {"provider": get_runtime_provider()}
 
 @router.post("/fetch/mode", dependencies=[Depends(get_api_key)])
-def set_fetch_mode(provider: str, reload_demo: bool = False, purge_demo: bool = False, db: Session = Depends(get_db)):
+def set_fetch_mode(provider: str, background_tasks: BackgroundTasks, reload_demo: bool = False, purge_demo: bool = False, db: Session = Depends(get_db)):
     provider = provider.lower()
     if provider == 'demo':
         # Switch to demo: stop fetcher, set runtime provider to demo (no external fetch)
@@ -581,7 +771,6 @@ def set_fetch_mode(provider: str, reload_demo: bool = False, purge_demo: bool =
                 summary = {"reloaded": False}
             else:
                 # call helper directly
-                from ..services.dataset_loader import load_dataset
                 path = os.getenv("DATASET_CSV_PATH", "68b1acd44f393_Sample_Support_Emails_Dataset.csv")
                 try:
                     summary = load_dataset(db, path, generate_responses=False, wipe=True)
@@ -594,102 +783,38 @@ def set_fetch_mode(provider: str, reload_demo: bool = False, purge_demo: bool =
         purged = 0
         tagged = 0
         if purge_demo:
-            from ..models.email_model import Email
-            tagged = db.query(Email).filter(Email.source=='unknown').update({"source":"demo"})
-            purged = db.query(Email).filter(Email.source=='demo').delete()
+            tagged = db.execute(update(Email).where(Email.source == 'unknown').values(source='demo').execution_options(synchronize_session=False)).rowcount
+            purged = db.execute(delete(Email).where(Email.source == 'demo').execution_options(synchronize_session=False)).rowcount
             db.commit()
-        # Immediate single fetch so user sees live emails without waiting for poll interval
-        created = 0
-        try:
-            from ..services.retrievers import fetch_any
-            from ..services.email_service import create_email, email_exists, email_exists_external
-            from ..schemas.email import EmailCreate
-            from ..services.nlp import analyze_sentiment, determine_priority
-            # Use queue-based generation to avoid bursts/rate limits
-            from ..services.queue_worker import enqueue_email
-            mails = fetch_any(limit=15)
-            for m in mails:
-                recv = _coerce_received(m.get('received_at'))
-                ext_id = m.get('external_id')
-                if ext_id and email_exists_external(db, ext_id):
-                    continue
-                if not ext_id and email_exists(db, m['sender'], m['subject'], recv):
-                    continue
-                sentiment = analyze_sentiment(m['body'])
-                priority = determine_priority(m['body'])
-                # Defer AI generation to worker
-                email_rec = create_email(db, EmailCreate(sender=m['sender'], subject=m['subject'], body=m['body'], received_at=recv), sentiment, priority, None, source='gmail', external_id=ext_id)
-                try:
-                    enqueue_email(email_rec.id, priority)
-                except Exception:
-                    pass
-                created += 1
-        except Exception:
-            created = -1
+        # Immediate single fetch so user sees live emails without waiting for
+        # the poll interval; runs out-of-band so the mode switch returns fast.
+        job_id = _new_fetch_job()
+        background_tasks.add_task(_do_single_fetch_bg, job_id)
         start_background_fetch()
-        return {"mode": "gmail", "started": True, "purged_demo": purged, "tagged_unknown_as_demo": tagged, "initial_live_fetched": created}
+        return {"mode": "gmail", "started": True, "purged_demo": purged, "tagged_unknown_as_demo": tagged, "initial_fetch_job": job_id}
     else:
         raise HTTPException(status_code=400, detail="Unsupported provider (use demo or gmail)")
 
-@router.post("/{email_id}/resolve", response_model=EmailOut, dependencies=[Depends(get_api_key)])
+@router.post("/{email_id}/resolve", response_model=None, dependencies=[Depends(get_api_key)])
 def resolve_email(email_id: int, db: Session = Depends(get_db)):
     record = mark_resolved(db, email_id)
     if not record:
         raise HTTPException(status_code=404, detail="Email not found")
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
-        sentiment=record.sentiment,
-        priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(sentiment=record.sentiment, priority=record.priority)
-    )
+    return _build_email_out(record)
 
-@router.post("/{email_id}/approve", response_model=EmailOut, dependencies=[Depends(get_api_key)])
+@router.post("/{email_id}/approve", response_model=None, dependencies=[Depends(get_api_key)])
 def approve(email_id: int, db: Session = Depends(get_db)):
     record = approve_email(db, email_id)
     if not record:
         raise HTTPException(status_code=404, detail="Email not found")
-    try:
-        broadcaster.publish("email_updated", f"{{\"id\":{record.id},\"status\":\"{record.status}\"}}")
-    except Exception:
-        pass
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
-        sentiment=record.sentiment,
-        priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(sentiment=record.sentiment, priority=record.priority)
-    )
+    _publish_updated(record)
+    return _build_email_out(record)
 
-@router.post("/{email_id}/send", response_model=EmailOut, dependencies=[Depends(get_api_key)])
+@router.post("/{email_id}/send", response_model=None, dependencies=[Depends(get_api_key)])
 def send(email_id: int, db: Session = Depends(get_db)):
     # Simulate send (would integrate SMTP / provider)
     record = mark_sent(db, email_id)
     if not record:
         raise HTTPException(status_code=404, detail="Email not found")
-    try:
-        broadcaster.publish("email_updated", f"{{\"id\":{record.id},\"status\":\"{record.status}\"}}")
-    except Exception:
-        pass
-    return EmailOut(
-        id=record.id,
-        sender=record.sender,
-        subject=record.subject,
-        body=record.body,
-        received_at=record.received_at,
-        sentiment=record.sentiment,
-        priority=record.priority,
-        auto_response=record.auto_response,
-        status=record.status,
-        extracted=ExtractedInfo(sentiment=record.sentiment, priority=record.priority)
-    )
+    _publish_updated(record)
+    return _build_email_out(record)
@@ -1,17 +1,40 @@
+import hmac
 import os
-from fastapi import HTTPException, Security, Request
+from functools import lru_cache
+from fastapi import HTTPException, Security
 from fastapi.security import APIKeyHeader
 
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+
+# The auth dependency runs before every protected endpoint; cache the env
+# lookups so each request skips two getenv calls. reload_auth() clears the
+# caches so ops can rotate the key without a restart.
+@lru_cache(maxsize=1)
+def _expected() -> str:
+    return os.getenv("SUPPORT_API_KEY") or ""
+
+
+@lru_cache(maxsize=1)
+def _allow_unauth() -> bool:
+    return os.getenv('ALLOW_UNAUTH_LOCAL') == '1'
+
+
+def reload_auth():
+    """Re-read SUPPORT_API_KEY / ALLOW_UNAUTH_LOCAL from the environment."""
+    _expected.cache_clear()
+    _allow_unauth.cache_clear()
+
+
 def get_api_key(api_key: str = Security(api_key_header)):
     """Validate API key from header if SUPPORT_API_KEY env var is set.
     If no expected key configured, allows open access (dev mode)."""
-    expected = os.getenv("SUPPORT_API_KEY")
-    if os.getenv('ALLOW_UNAUTH_LOCAL') == '1':
+    if _allow_unauth():
         return None
+    expected = _expected()
     if not expected:
         return None  # open mode
-    if not api_key or api_key != expected:
+    # compare_digest: constant-time, no early exit on first differing byte
+    if not hmac.compare_digest(api_key or "", expected):
         raise HTTPException(status_code=401, detail="Unauthorized")
-    return api_key
\ No newline at end of file
+    return api_key
@@ -1,7 +1,13 @@
 from typing import List, Dict, Any
-import os, logging, concurrent.futures, json, time, threading, random
+import asyncio
+import hashlib
+from dataclasses import dataclass
+import os, re, logging, concurrent.futures, json, time, threading, random
+from collections import OrderedDict
 from concurrent.futures import TimeoutError as FuturesTimeout
 
+from . import semantic_cache
+
 try:  # Gemini client (optional now)
     import google.generativeai as genai  # type: ignore
     GEMINI_AVAILABLE = True
@@ -15,19 +21,81 @@ LAST_OR_ERROR: dict | None = None  # OpenRouter provider
 
 # Simple in-process rate limiter for OpenRouter calls
 _rate_lock = threading.Lock()
-_last_or_ts: float = 0.0  # monotonic seconds
-_or_cooldown_until: float = 0.0  # monotonic seconds; after repeated 429s
+_or_cooldown_until: float = 0.0  # epoch seconds; after repeated 429s
+
+# When REDIS_URL is set, the cooldown is mirrored into Redis (reusing
+# nlp_cache's guarded client) so all workers honor one breaker: under
+# multi-worker serving each process otherwise has to earn its own 429s
+# before backing off. Stored as epoch seconds; the key's TTL matches the
+# cooldown so stale state clears itself.
+_OR_BREAKER_KEY = 'or:cooldown_until'
+
+
+def _breaker_get() -> float:
+    """Return the active cooldown deadline (epoch seconds), 0.0 if closed."""
+    global _or_cooldown_until
+    now = time.time()
+    with _rate_lock:
+        if now < _or_cooldown_until:
+            return _or_cooldown_until
+    from .nlp_cache import _get_redis
+    r = _get_redis()
+    if r is not None:
+        try:
+            raw = r.get(_OR_BREAKER_KEY)
+            if raw:
+                until = float(raw)
+                if now < until:
+                    with _rate_lock:  # adopt a peer worker's cooldown locally
+                        _or_cooldown_until = max(_or_cooldown_until, until)
+                    return until
+        except Exception:  # pragma: no cover - breaker degrades to per-process
+            pass
+    return 0.0
+
+
+def _breaker_set(seconds: float) -> None:
+    global _or_cooldown_until
+    until = time.time() + seconds
+    with _rate_lock:
+        _or_cooldown_until = max(_or_cooldown_until, until)
+    from .nlp_cache import _get_redis
+    r = _get_redis()
+    if r is not None:
+        try:
+            r.set(_OR_BREAKER_KEY, repr(until), ex=max(1, int(seconds)))
+        except Exception:  # pragma: no cover
+            pass
+
+# Quota circuit breaker mirroring Gemini's ResourceExhausted backoff: repeated
+# 429/402 responses escalate the wait exponentially (30s..1h) and short-circuit
+# _generate_openrouter straight to the fallback chain until it expires, instead
+# of paying a doomed round-trip per ticket.
+_or_backoff = {'until_mono': 0.0, 'level': 0}
+
+
+def _or_backoff_hit():
+    with _rate_lock:
+        level = min(_or_backoff['level'] + 1, 6)
+        _or_backoff['level'] = level
+        _or_backoff['until_mono'] = time.monotonic() + min(3600.0, 30.0 * (2 ** level))
+
+
+def _or_backoff_reset():
+    with _rate_lock:
+        _or_backoff['level'] = 0
+        _or_backoff['until_mono'] = 0.0
 
 def test_llm() -> dict:
     """Small probe for currently selected provider."""
-    provider = os.getenv('LLM_PROVIDER', 'gemini').lower()
+    provider = CONFIG.provider
     if provider in {'openrouter','or'}:
         key_ok = bool(os.getenv('OPENROUTER_API_KEY'))
         if not key_ok:
             return {"ok": False, "provider": provider, "reason": "missing_api_key"}
         try:
             txt = _openrouter_call("Ping", test_mode=True)
-            return {"ok": True, "provider": provider, "text": (txt or '')[:120], "model": os.getenv('OPENROUTER_MODEL','openrouter/sonoma-sky-alpha')}
+            return {"ok": True, "provider": provider, "text": (txt or '')[:120], "model": CONFIG.openrouter_model}
         except Exception as e:  # pragma: no cover
             return {"ok": False, "provider": provider, "error_type": type(e).__name__, "error_message": str(e)}
     # gemini path
@@ -35,9 +103,9 @@ def test_llm() -> dict:
         return {"ok": False, "provider": provider, "reason": "library_not_installed"}
     if not os.getenv('GOOGLE_API_KEY'):
         return {"ok": False, "provider": provider, "reason": "missing_api_key"}
-    model_name = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+    model_name = CONFIG.gemini_model
     try:
-        model = genai.GenerativeModel(model_name)  # type: ignore
+        model = _get_model(model_name)
         resp = model.generate_content("Ping")  # type: ignore
         txt = _gemini_extract_text(resp).strip() if resp else ""
         return {"ok": True, "provider": provider, "model": model_name, "text": txt[:120]}
@@ -49,16 +117,239 @@ SYSTEM_PROMPT = (
     "Always respond with concise, actionable guidance."
 )
 
-if GEMINI_AVAILABLE:
-    _api_key = os.getenv('GOOGLE_API_KEY', '')
-    if _api_key:
+# Prompt scaffolding is static per process; pre-building it means each request
+# does one .format() over a prefix instead of re-concatenating the same
+# f-string pieces on the hot path.
+_USER_TEMPLATE = (
+    "Subject: {subject}\n"
+    "Sentiment: {sentiment}\nPriority: {priority}\n"
+    "Customer email:\n{body}\n\nDraft a helpful support reply:"
+)
+_GEMINI_PREFIX_TEMPLATE = SYSTEM_PROMPT + "\n\nContext:\n{context}\n\n"
+_OPENROUTER_PROMPT_TEMPLATE = (
+    "Context:\n{context}\n\n"
+    "Subject: {subject}\nSentiment: {sentiment}\nPriority: {priority}\n"
+    "Customer email (may be truncated):\n{body}\n\nDraft a helpful support reply."
+)
+
+
+_OPENROUTER_PROMPT_NOCTX_TEMPLATE = _OPENROUTER_PROMPT_TEMPLATE[len("Context:\n{context}\n\n"):]
+
+
+# Empty context previously still shipped a bare "Context:" block — wasted
+# prompt tokens on every cold-start/small-index call. These helpers drop the
+# block entirely when there is nothing to put in it; LLM_INCLUDE_CONTEXT=0
+# turns context off wholesale for token-starved deployments.
+def _gemini_prompt_prefix(context: str) -> str:
+    if context:
+        return _GEMINI_PREFIX_TEMPLATE.format(context=context)
+    return SYSTEM_PROMPT + "\n\n"
+
+
+def _openrouter_prompt(context: str, subject: str, sentiment: str, priority: str, body: str) -> str:
+    template = _OPENROUTER_PROMPT_TEMPLATE if context else _OPENROUTER_PROMPT_NOCTX_TEMPLATE
+    return template.format(
+        context=context, subject=subject, sentiment=sentiment, priority=priority, body=body)
+
+# Settings that were previously re-read (and re-parsed from strings) via
+# os.getenv 8-12 times per request. They only change on deploy, so they are
+# snapshotted once at import; reload_config() rebinds the snapshot for tests.
+# Per-call tuning (OPENROUTER_MAX_TOKENS/_TEMPERATURE, overridable as
+# kwargs on retry) and on/off flags toggled per-request stay as live
+# getenv reads.
+@dataclass(frozen=True)
+class LLMConfig:
+    provider: str
+    gemini_model: str
+    gemini_timeout_s: float
+    gemini_backoff_s: float
+    gemini_max_output_tokens: int
+    gemini_model_ctx: int
+    openrouter_model: str
+    openrouter_base: str
+    openrouter_timeout_s: float
+    openrouter_min_interval_ms: int
+    openrouter_cooldown_s: float
+    openrouter_backoff_base_s: float
+    openrouter_backoff_cap_s: float
+    openrouter_max_attempts: int
+    openrouter_max_body_chars: int
+    openrouter_max_tokens: int
+    openrouter_retry_max_tokens: int
+    openrouter_temperature: float
+    openrouter_model_ctx: int
+    openrouter_referrer: str
+    openrouter_app_name: str
+
+
+def _load_config() -> LLMConfig:
+    return LLMConfig(
+        provider=os.getenv('LLM_PROVIDER', 'gemini').lower(),
+        gemini_model=os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'),
+        gemini_timeout_s=float(os.getenv('GEMINI_TIMEOUT', '6')),
+        gemini_backoff_s=float(os.getenv('GEMINI_BACKOFF_SECONDS', '600')),
+        gemini_max_output_tokens=int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS', '1024')),
+        gemini_model_ctx=int(os.getenv('GEMINI_MODEL_CTX', '131072')),
+        openrouter_model=os.getenv('OPENROUTER_MODEL', 'openrouter/sonoma-sky-alpha'),
+        openrouter_base=os.getenv('OPENROUTER_BASE', 'https://openrouter.ai/api/v1/chat/completions'),
+        openrouter_timeout_s=float(os.getenv('OPENROUTER_TIMEOUT', os.getenv('LLM_TIMEOUT', '10'))),
+        openrouter_min_interval_ms=int(os.getenv('OPENROUTER_MIN_INTERVAL_MS', '1200')),
+        openrouter_cooldown_s=float(os.getenv('OPENROUTER_COOLDOWN_S', '60')),
+        openrouter_backoff_base_s=float(os.getenv('OPENROUTER_BACKOFF_BASE_S', '0.5')),
+        openrouter_backoff_cap_s=float(os.getenv('OPENROUTER_BACKOFF_CAP_S', '60')),
+        openrouter_max_attempts=int(os.getenv('OPENROUTER_MAX_ATTEMPTS', '5')),
+        openrouter_max_body_chars=int(os.getenv('OPENROUTER_MAX_BODY_CHARS', '4000')),
+        openrouter_max_tokens=int(os.getenv('OPENROUTER_MAX_TOKENS', '512')),
+        openrouter_retry_max_tokens=int(os.getenv('OPENROUTER_RETRY_MAX_TOKENS', '256')),
+        openrouter_temperature=float(os.getenv('OPENROUTER_TEMPERATURE', '0.4')),
+        openrouter_model_ctx=int(os.getenv('OPENROUTER_MODEL_CTX', '16384')),
+        openrouter_referrer=os.getenv('OPENROUTER_REFERRER', 'http://localhost'),
+        openrouter_app_name=os.getenv('OPENROUTER_APP_NAME', 'SupportAssistant'),
+    )
+
+
+CONFIG = _load_config()
+
+
+def reload_config() -> LLMConfig:
+    """Re-read env into a fresh snapshot (tests / post-deploy env changes)."""
+    global CONFIG
+    CONFIG = _load_config()
+    return CONFIG
+
+
+# Gemini SDK setup happens once; model objects are cached per name since
+# construction repeats SDK plumbing on every call otherwise.
+_configured = False
+_MODEL_CACHE: Dict[str, Any] = {}
+_model_lock = threading.Lock()
+
+
+def _ensure_configured():
+    global _configured
+    if _configured or not GEMINI_AVAILABLE:
+        return
+    api_key = os.getenv('GOOGLE_API_KEY', '')
+    if api_key:
         try:
-            genai.configure(api_key=_api_key)  # type: ignore
+            genai.configure(api_key=api_key)  # type: ignore
         except Exception:
             pass
+    _configured = True
+
+
+def _get_model(model_name: str):
+    model = _MODEL_CACHE.get(model_name)
+    if model is None:
+        with _model_lock:
+            model = _MODEL_CACHE.get(model_name)
+            if model is None:
+                _ensure_configured()
+                model = genai.GenerativeModel(model_name)  # type: ignore
+                _MODEL_CACHE[model_name] = model
+    return model
+
+
+if GEMINI_AVAILABLE:
+    _ensure_configured()
+
+try:  # optional exact tokenizer for prompt budgeting
+    import tiktoken  # type: ignore
+    _TOKENIZER = tiktoken.get_encoding('cl100k_base')
+except Exception:  # pragma: no cover
+    _TOKENIZER = None
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1200'))
+
+
+def _count_tokens(text: str) -> int:
+    if _TOKENIZER is not None:
+        return len(_TOKENIZER.encode(text))
+    return max(1, len(text) // 4)  # ~4 chars/token heuristic when tiktoken absent
+
+
+_PROMPT_SAFETY_TOKENS = 128
+
+
+def _shrink_prompt(prompt: str, context: str, body: str, rebuild, max_out_tokens: int, model_ctx: int) -> str:
+    """Fit prompt under model_ctx - max_out_tokens - safety, in tokens.
+
+    Char caps alone miss the real limit: context + system prompt can still
+    blow the token budget and cost a 400/413 round-trip. Whole context
+    snippet lines are dropped from the end first (build_context orders them
+    by descending score), then the body tail is cut; headers and the closing
+    instruction survive both stages. rebuild(context, body) reassembles the
+    provider prompt.
+    """
+    budget = model_ctx - max_out_tokens - _PROMPT_SAFETY_TOKENS
+    if budget <= 0 or _count_tokens(prompt) <= budget:
+        return prompt
+    lines = context.splitlines()
+    while lines:
+        lines.pop()
+        prompt = rebuild("\n".join(lines), body)
+        if _count_tokens(prompt) <= budget:
+            return prompt
+    while body and _count_tokens(prompt) > budget:
+        body = body[:int(len(body) * 0.8)]
+        prompt = rebuild("", body + "\n...[truncated]")
+    return prompt
+
+
+# Burst traffic from the fetch loop retrieves heavily-overlapping snippet
+# sets, so the formatted context repeats; memoizing the finished string skips
+# the sort/dedup/token-count pass on a repeat. Keyed by a digest of the
+# snippet openings and bucketed scores so float noise doesn't defeat it.
+_CONTEXT_LRU_SIZE = int(os.getenv('CONTEXT_CACHE_SIZE', '512'))
+_context_lru: "OrderedDict[bytes, str]" = OrderedDict()
+_context_lru_lock = threading.Lock()
+
+
+def _context_lru_key(rag_results: List[tuple]) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for text, score in rag_results:
+        h.update(text[:120].encode('utf-8', 'ignore'))
+        h.update(f"{score:.2f}".encode())
+    return h.digest()
+
 
 def build_context(rag_results: List[tuple]) -> str:
-    return "\n".join([f"Doc snippet (score={score:.2f}): {text[:300]}" for text, score in rag_results])
+    """Format RAG snippets for the prompt, deduplicated and token-budgeted.
+
+    Similar KB snippets often retrieve together; a fingerprint of each
+    snippet's normalized opening drops near-duplicates, and a running token
+    budget (CONTEXT_TOKEN_BUDGET) caps what we pay for context. Highest-score
+    snippets are kept first. Results are memoized per snippet set.
+    """
+    if not rag_results or os.getenv('LLM_INCLUDE_CONTEXT', '1') != '1':
+        return ''
+    key = _context_lru_key(rag_results)
+    with _context_lru_lock:
+        cached = _context_lru.get(key)
+        if cached is not None:
+            _context_lru.move_to_end(key)
+            return cached
+    seen: set = set()
+    parts: List[str] = []
+    budget = CONTEXT_TOKEN_BUDGET
+    for text, score in sorted(rag_results, key=lambda r: r[1], reverse=True):
+        norm = ' '.join(text[:120].lower().split())
+        fp = hashlib.blake2b(norm.encode('utf-8', 'ignore'), digest_size=8).digest()
+        if fp in seen:
+            continue
+        seen.add(fp)
+        snippet = f"Doc snippet (score={score:.2f}): {text[:300]}"
+        cost = _count_tokens(snippet)
+        if cost > budget:
+            break
+        budget -= cost
+        parts.append(snippet)
+    context = "\n".join(parts)
+    with _context_lru_lock:
+        _context_lru[key] = context
+        if len(_context_lru) > _CONTEXT_LRU_SIZE:
+            _context_lru.popitem(last=False)
+    return context
 
 def _gemini_extract_text(resp):  # pragma: no cover
     if not resp:
@@ -71,64 +362,468 @@ def _gemini_extract_text(resp):  # pragma: no cover
     except Exception:
         return ""
 
+# Compiled once; scanning only the opening of the body avoids lowercasing a
+# full copy of long emails on every fallback. Keywords live in alternation so
+# new intents extend the pattern instead of adding another pass.
+# Intent table for the local fallback: one combined alternation with a named
+# group per intent keeps detection a single linear scan however many intents
+# are added — extend the dict, not the function. First match in body order
+# wins; scanning only the opening avoids lowercasing long emails.
+_FALLBACK_INTENTS: Dict[str, tuple] = {
+    'password': (r'password|passcode|reset\s+(?:my\s+)?login',
+                 "Thanks for reaching out about your password issue."),
+    'billing': (r'refund|invoice|billing|charged?\s+twice|overcharg',
+                "Thanks for flagging this billing concern."),
+    'access': (r'cannot\s+(?:access|log\s*in)|locked\s+out|account\s+locked',
+               "Sorry you're having trouble accessing your account."),
+}
+_INTENT_RE = re.compile(
+    r'\b(?:' + '|'.join(f'(?P<{name}>{pat})' for name, (pat, _msg) in _FALLBACK_INTENTS.items()) + r')\b',
+    re.IGNORECASE,
+)
+_FALLBACK_SCAN_CHARS = 512
+
+
 def _local_fallback_reply(subject: str, body: str, sentiment: str, priority: str) -> str:
     summary = (body[:240] + '...') if len(body) > 240 else body
     intro = "Thank you for contacting support."
-    if 'password' in body.lower():
-        intro = "Thanks for reaching out about your password issue."
+    m = _INTENT_RE.search(body[:_FALLBACK_SCAN_CHARS])
+    if m and m.lastgroup:
+        intro = _FALLBACK_INTENTS[m.lastgroup][1]
     action = "We'll investigate and get back to you shortly."
     if priority == 'Urgent':
         action = "We're treating this as high priority and will update you ASAP."
     closing = "Kind regards,\nSupport Team"
     return f"Subject: Re: {subject}\n\n{intro}\n\nI reviewed your message: \n{summary}\n\n{action}\n\n{closing}"
 
+# Exact-match reply cache: support queues repeat templated messages (password
+# resets, outage reports), which otherwise trigger a full LLM call each time.
+# Keyed on normalized subject + body digest + sentiment/priority + provider,
+# model and RAG context, with CACHE_VERSION so format changes invalidate.
+CACHE_VERSION = 1
+REPLY_CACHE_SIZE = int(os.getenv('REPLY_CACHE_SIZE', '2048'))
+REPLY_CACHE_MIN_BODY = 20  # skip trivially short bodies
+_reply_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_reply_cache_lock = threading.Lock()
+_reply_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _reply_cache_key(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]):
+    if len(body or '') < REPLY_CACHE_MIN_BODY:
+        return None
+    provider = CONFIG.provider
+    if provider in {'openrouter', 'or'}:
+        model = CONFIG.openrouter_model
+    else:
+        model = CONFIG.gemini_model
+    subj = ' '.join((subject or '').split()).lower()
+    digest = hashlib.blake2b(body.encode('utf-8', 'ignore'), digest_size=16)
+    for text, _score in rag_results or []:
+        digest.update(text.encode('utf-8', 'ignore'))
+    return (CACHE_VERSION, provider, model, subj, digest.digest(), sentiment, priority)
+
+
+# Single-flight: during duplicate storms several workers can miss the cache
+# for the same ticket at once and fan out identical LLM calls. Followers with
+# the same cache key join the leader's in-flight Future instead.
+_inflight: Dict[tuple, concurrent.futures.Future] = {}
+_inflight_lock = threading.Lock()
+_INFLIGHT_WAIT_S = 120.0  # generous bound: leader may walk the full retry/fallback chain
+
+
+def _dispatch_generate(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]) -> str:
+    # resolved via the module-level table; unknown values fall back to gemini
+    primary, secondary = _PROVIDER_MAP.get(CONFIG.provider, _DEFAULT_PROVIDER_PAIR)
+    args = (subject, body, sentiment, priority, rag_results)
+    if os.getenv('LLM_HEDGE_ENABLED') == '1':
+        return _hedged_generate(primary, secondary, args)
+    return primary(*args)
+
+
 def generate_response(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]) -> str:
     """Generate a reply using configured LLM provider (gemini | openrouter | fallback)."""
-    provider = os.getenv('LLM_PROVIDER', 'gemini').lower()
-    if provider in {'openrouter','or'}:
-        return _generate_openrouter(subject, body, sentiment, priority, rag_results)
-    # default to gemini path for any other value (including 'gemini')
-    return _generate_gemini(subject, body, sentiment, priority, rag_results)
+    key = _reply_cache_key(subject, body, sentiment, priority, rag_results)
+    if key is not None:
+        with _reply_cache_lock:
+            cached = _reply_cache.get(key)
+            if cached is not None:
+                _reply_cache.move_to_end(key)
+                _reply_cache_stats["hits"] += 1
+                return cached
+            _reply_cache_stats["misses"] += 1
+    # near-duplicate tickets (same issue, different wording) hit the opt-in
+    # embedding cache; exact-match misses fall through to here. Only the body
+    # opening feeds the embedding — topic lives up front, and a shorter input
+    # keeps the encode cheap — and hits must match on priority.
+    semantic_key = f"{subject}\n{body[:512]}"
+    semantic_hit = semantic_cache.lookup(semantic_key, priority)
+    if semantic_hit is not None:
+        return semantic_hit
+    if key is None:
+        reply = _dispatch_generate(subject, body, sentiment, priority, rag_results)
+    else:
+        with _inflight_lock:
+            fut = _inflight.get(key)
+            leader = fut is None
+            if leader:
+                fut = concurrent.futures.Future()
+                _inflight[key] = fut
+        if not leader:
+            # duplicate burst: piggyback on the call already in flight
+            return fut.result(timeout=_INFLIGHT_WAIT_S)
+        try:
+            reply = _dispatch_generate(subject, body, sentiment, priority, rag_results)
+            fut.set_result(reply)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+    # sentinel tokens ([GEMINI_TIMEOUT] etc.) are transient; never cache them
+    if reply and not reply.startswith('['):
+        if key is not None:
+            with _reply_cache_lock:
+                _reply_cache[key] = reply
+                _reply_cache.move_to_end(key)
+                if len(_reply_cache) > REPLY_CACHE_SIZE:
+                    _reply_cache.popitem(last=False)
+        semantic_cache.store(semantic_key, reply, priority)
+    return reply
+
+# Hedged requests (LLM_HEDGE_ENABLED=1): when the primary provider is
+# degraded, serial retry-then-chain costs timeout + retry + fallback of wall
+# clock. Instead, once the primary has been quiet for LLM_HEDGE_DELAY_MS the
+# secondary provider starts in parallel and the first usable reply wins.
+# Off by default since the hedge doubles spend whenever it fires.
+HEDGE_DELAY_MS = int(os.getenv('LLM_HEDGE_DELAY_MS', '2000'))
+_hedge_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> concurrent.futures.ThreadPoolExecutor:
+    # dedicated pool: hedge tasks may run while generate_response itself is on
+    # the bulk fan-out pool, and sharing would let them starve each other
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=2 * int(os.getenv('LLM_CONCURRENCY', '8')),
+                    thread_name_prefix='llm-hedge')
+    return _hedge_executor
+
+
+def _hedged_generate(primary, secondary, args: tuple) -> str:
+    """Race primary against a delayed secondary; first usable reply wins.
+
+    Sentinel replies (leading '[') and exceptions count as failures while the
+    race is live; if nothing usable arrives, the best sentinel seen (or a
+    hedge sentinel) is returned so callers keep their existing handling.
+    """
+    ex = _get_hedge_executor()
+    fut_p = ex.submit(primary, *args)
+    fallback = None
+    try:
+        reply = fut_p.result(timeout=HEDGE_DELAY_MS / 1000.0)
+        if reply and not reply.startswith('['):
+            return reply
+        fallback = reply or None
+    except FuturesTimeout:
+        pass
+    except Exception:
+        pass
+    pending = {fut_p, ex.submit(secondary, *args)}
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for fut in done:
+            try:
+                reply = fut.result()
+            except Exception:
+                continue
+            if reply and not reply.startswith('['):
+                for loser in pending:
+                    loser.cancel()  # best-effort; running calls finish quietly
+                return reply
+            if reply and fallback is None:
+                fallback = reply
+    return fallback if fallback is not None else '[LLM_HEDGE_FAILED]'
+
+
+# Batch generation: LLM calls are network-bound, so overlapping them turns
+# N*latency into ~latency for a fetched batch. Concurrency stays bounded to
+# respect provider rate limits (OpenRouter additionally spaces calls via
+# _rate_lock above). Lazy singleton so importing this module stays cheap.
+GENERATE_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '8'))
+_gen_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_gen_executor_lock = threading.Lock()
+
+def _get_gen_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _gen_executor
+    if _gen_executor is None:
+        with _gen_executor_lock:
+            if _gen_executor is None:
+                _gen_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=GENERATE_CONCURRENCY, thread_name_prefix='llm-gen')
+    return _gen_executor
+
+async def generate_response_async(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]) -> str:
+    """generate_response for event-loop callers; never blocks the loop.
+
+    Runs the full sync pipeline (reply caches, backoff, local fallback) on
+    the bounded generation pool, so ``asyncio.gather`` over many of these
+    overlaps the network waits the same way generate_responses_bulk does.
+    Mirrors the *_async wrappers in nlp_cache.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_gen_executor(), generate_response, subject, body, sentiment, priority, rag_results)
+
+
+async def generate_responses_async(jobs: List[tuple]) -> List[Any]:
+    """Async counterpart of generate_responses_bulk: one result per job, in
+    order, with exceptions returned rather than raised."""
+    return await asyncio.gather(
+        *(generate_response_async(*job) for job in jobs), return_exceptions=True)
+
+
+# Timeout plumbing for the Gemini SDK. Newer SDKs accept a per-call
+# request_options timeout (no extra thread at all); older ones need a future
+# with a deadline, which runs on this shared pool instead of a throwaway
+# ThreadPoolExecutor per request. Separate from _gen_executor so fan-out
+# workers waiting on timeouts can never exhaust their own pool.
+_timeout_executor: concurrent.futures.ThreadPoolExecutor | None = None
+_timeout_executor_lock = threading.Lock()
+_sdk_timeout_supported: bool | None = None  # None = not probed yet
+
+
+def _get_timeout_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _timeout_executor
+    if _timeout_executor is None:
+        with _timeout_executor_lock:
+            if _timeout_executor is None:
+                import atexit
+                _timeout_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=int(os.getenv('LLM_MAX_WORKERS', '16')),
+                    thread_name_prefix='llm-timeout')
+                atexit.register(_timeout_executor.shutdown, wait=False)
+    return _timeout_executor
+
+
+def _generate_content_with_timeout(model, prompt: str, timeout_s: float):
+    """Run model.generate_content with a deadline; raises FuturesTimeout.
+
+    Tries the SDK-native request_options timeout first and remembers whether
+    the installed SDK supports it, so the executor fallback only ever runs on
+    old versions.
+    """
+    global _sdk_timeout_supported
+    if _sdk_timeout_supported is not False:
+        try:
+            resp = model.generate_content(prompt, request_options={'timeout': timeout_s})
+            _sdk_timeout_supported = True
+            return resp
+        except TypeError:  # SDK predates request_options
+            _sdk_timeout_supported = False
+        except Exception as e:
+            if type(e).__name__ == 'DeadlineExceeded':
+                raise FuturesTimeout() from e
+            raise
+    fut = _get_timeout_executor().submit(model.generate_content, prompt)
+    try:
+        return fut.result(timeout=timeout_s)
+    except FuturesTimeout:
+        # cancel is a no-op once the call is running, but it drops queued
+        # work so a backlog of timed-out requests can't occupy the pool
+        fut.cancel()
+        raise
+
+
+def generate_responses_bulk(jobs: List[tuple]) -> List[Any]:
+    """Generate replies for a batch of emails concurrently.
+
+    Each job is (subject, body, sentiment, priority, rag_results). Returns one
+    entry per job, in order: the reply string on success, or the raised
+    exception so callers keep their per-email retry bookkeeping.
+
+    With LLM_BATCH_PROMPTS=1, chunks of up to LLM_BATCH_SIZE tickets go out
+    as one batched prompt first (amortizing the system-prompt tokens and the
+    network round-trip); any chunk whose structured response cannot be parsed
+    falls back to the per-ticket fan-out.
+    """
+    if not jobs:
+        return []
+    if len(jobs) == 1:  # skip executor hand-off for the common single case
+        try:
+            return [generate_response(*jobs[0])]
+        except Exception as e:
+            return [e]
+    if os.getenv('LLM_BATCH_PROMPTS') == '1':
+        results: List[Any] = []
+        for start in range(0, len(jobs), LLM_BATCH_SIZE):
+            chunk = jobs[start:start + LLM_BATCH_SIZE]
+            batched = generate_responses_batched(chunk) if len(chunk) > 1 else None
+            results.extend(batched if batched is not None else _fanout(chunk))
+        return results
+    return _fanout(jobs)
+
+
+def _fanout(jobs: List[tuple]) -> List[Any]:
+    futures = [_get_gen_executor().submit(generate_response, *job) for job in jobs]
+    results: List[Any] = []
+    for fut in futures:
+        try:
+            results.append(fut.result())
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+# Batched prompting: one call for b tickets amortizes the shared system
+# prompt and round-trip. Kept modest by default — reply quality degrades if
+# too many tickets share one completion.
+LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', '6'))
+_BATCH_ITEM_RE = re.compile(r'(?m)^\s*\[(\d+)\]')
+
+
+def _raw_generate(prompt: str) -> str:
+    """Send an already-built prompt to the configured provider."""
+    provider = CONFIG.provider
+    if provider in {'openrouter', 'or'}:
+        return _openrouter_call(prompt)
+    if not GEMINI_AVAILABLE or not os.getenv('GOOGLE_API_KEY'):
+        raise RuntimeError('gemini_unavailable')
+    model = _get_model(CONFIG.gemini_model)
+    resp = model.generate_content(prompt)  # type: ignore
+    return _gemini_extract_text(resp).strip()
+
+
+def generate_responses_batched(jobs: List[tuple]):
+    """One prompt for several tickets; replies split back out by [i] markers.
+
+    Returns the list of replies in job order, or None when the call failed or
+    the structured response could not be parsed (caller falls back to
+    per-ticket generation).
+    """
+    parts = [
+        f"{SYSTEM_PROMPT}\n\n"
+        "For each numbered customer email below, write a helpful support reply.\n"
+        "Start reply i with '[i]' on its own line, keep the replies in order, "
+        "and separate them with '---'.\n"
+    ]
+    for i, (subject, body, sentiment, priority, rag_results) in enumerate(jobs, 1):
+        context = build_context(rag_results)
+        parts.append(
+            f"\n[{i}] Subject: {subject}\nSentiment: {sentiment}\nPriority: {priority}\n"
+            + (f"Context:\n{context}\n" if context else "")
+            + f"Customer email:\n{body}\n"
+        )
+    try:
+        text = _raw_generate("".join(parts))
+    except Exception:
+        return None
+    if not text:
+        return None
+    matches = list(_BATCH_ITEM_RE.finditer(text))
+    if len(matches) < len(jobs):
+        return None
+    replies: Dict[int, str] = {}
+    for j, m in enumerate(matches):
+        end = matches[j + 1].start() if j + 1 < len(matches) else len(text)
+        replies[int(m.group(1))] = text[m.end():end].strip().strip('-').strip()
+    out: List[str] = []
+    for i in range(1, len(jobs) + 1):
+        reply = replies.get(i, '')
+        if not reply:
+            return None
+        out.append(reply)
+    return out
+
+# Gemini context caching: SYSTEM_PROMPT plus the RAG context repeats verbatim
+# across requests that hit the same KB snippets, so those tokens can be
+# uploaded once as a CachedContent handle and referenced thereafter — the
+# per-call prompt shrinks to just the ticket. Opt-in (GEMINI_CONTEXT_CACHE=1)
+# because the API enforces a minimum prefix size and needs a recent SDK; any
+# failure silently keeps the inline-prompt path.
+_context_cache: Dict[bytes, tuple] = {}  # key -> (expires_at_monotonic, model)
+_context_cache_lock = threading.Lock()
+GEMINI_CONTEXT_CACHE_TTL_S = float(os.getenv('GEMINI_CONTEXT_CACHE_TTL_S', '600'))
+
+
+def _get_context_cached_model(model_name: str, context: str):
+    """Return a GenerativeModel bound to a cached prompt prefix, or None."""
+    if os.getenv('GEMINI_CONTEXT_CACHE') != '1' or not context:
+        return None
+    caching = getattr(genai, 'caching', None)
+    if caching is None:  # SDK predates context caching
+        return None
+    key = hashlib.blake2b(
+        (model_name + SYSTEM_PROMPT + context).encode('utf-8', 'ignore'), digest_size=16
+    ).digest()
+    now = time.monotonic()
+    with _context_cache_lock:
+        entry = _context_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        _context_cache.pop(key, None)
+    try:
+        cached = caching.CachedContent.create(
+            model=model_name,
+            system_instruction=SYSTEM_PROMPT,
+            contents=[context],
+            ttl=f"{int(GEMINI_CONTEXT_CACHE_TTL_S)}s",
+        )
+        model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+    except Exception as e:
+        logging.getLogger(__name__).info(
+            "gemini_context_cache_unavailable", extra={"error": type(e).__name__})
+        return None
+    # expire our handle 30s early so we never reference a server-side-expired cache
+    with _context_cache_lock:
+        _context_cache[key] = (now + GEMINI_CONTEXT_CACHE_TTL_S - 30, model)
+    return model
+
 
 def _generate_gemini(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]) -> str:
     log = logging.getLogger(__name__)
     context = build_context(rag_results)
-    prompt = (
-        f"{SYSTEM_PROMPT}\n\n"
-        f"Context:\n{context}\n\n"
-        f"Subject: {subject}\n"
-        f"Sentiment: {sentiment}\nPriority: {priority}\n"
-        f"Customer email:\n{body}\n\nDraft a helpful support reply:".strip()
-    )
+    user_part = _USER_TEMPLATE.format(subject=subject, sentiment=sentiment, priority=priority, body=body)
+    prompt = _gemini_prompt_prefix(context) + user_part
+    prompt = _shrink_prompt(
+        prompt, context, body,
+        lambda c, b: _gemini_prompt_prefix(c) + _USER_TEMPLATE.format(
+            subject=subject, sentiment=sentiment, priority=priority, body=b),
+        max_out_tokens=CONFIG.gemini_max_output_tokens,
+        model_ctx=CONFIG.gemini_model_ctx)
     global LAST_GEMINI_ERROR
     if os.getenv('GEMINI_FORCE_DISABLE') == '1':
         return _local_fallback_reply(subject, body, sentiment, priority)
     if not GEMINI_AVAILABLE or not os.getenv('GOOGLE_API_KEY'):
         log.warning("Gemini unavailable or missing key; returning sentinel token instead of fallback")
         return "[GEMINI_UNAVAILABLE]"
-    backoff_s = float(os.getenv('GEMINI_BACKOFF_SECONDS', '600'))
+    backoff_s = CONFIG.gemini_backoff_s
     if LAST_GEMINI_ERROR and LAST_GEMINI_ERROR.get('error_type') == 'ResourceExhausted':
-        from datetime import datetime, timezone
         ts = LAST_GEMINI_ERROR.get('ts')
         if isinstance(ts, (int, float)):
-            elapsed = datetime.now(timezone.utc).timestamp() - ts
+            elapsed = time.time() - ts
             if elapsed < backoff_s:
                 log.info("Gemini quota backoff active; using fallback", extra={"remaining_s": round(backoff_s - elapsed,1)})
                 return _local_fallback_reply(subject, body, sentiment, priority) if os.getenv('FALLBACK_LOCAL_REPLY','1')=='1' else "[GEMINI_QUOTA_BACKOFF]"
     try:
-        model_name = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
-        model = genai.GenerativeModel(model_name)  # type: ignore
-        timeout_s = float(os.getenv('GEMINI_TIMEOUT', '6'))
-        resp = None
-        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-            fut = ex.submit(model.generate_content, prompt)  # type: ignore
-            try:
-                resp = fut.result(timeout=timeout_s)
-            except FuturesTimeout:
-                from datetime import datetime, timezone
-                LAST_GEMINI_ERROR = {"error_type": "Timeout", "error_message": f">{timeout_s}s", "model": model_name, "ts": datetime.now(timezone.utc).timestamp()}
-                log.warning("Gemini generation timeout", extra={"timeout_s": timeout_s, "model": model_name})
-                return _local_fallback_reply(subject, body, sentiment, priority) if os.getenv('FALLBACK_LOCAL_REPLY','1')=='1' else "[GEMINI_TIMEOUT]"
+        model_name = CONFIG.gemini_model
+        model = _get_model(model_name)
+        timeout_s = CONFIG.gemini_timeout_s
+        cached_model = _get_context_cached_model(model_name, context)
+        if cached_model is not None:
+            # prefix lives server-side; only the ticket itself goes over the wire
+            model, prompt = cached_model, user_part
+        try:
+            resp = _generate_content_with_timeout(model, prompt, timeout_s)
+        except FuturesTimeout:
+            LAST_GEMINI_ERROR = {"error_type": "Timeout", "error_message": f">{timeout_s}s", "model": model_name, "ts": time.time()}
+            log.warning("Gemini generation timeout", extra={"timeout_s": timeout_s, "model": model_name})
+            return _local_fallback_reply(subject, body, sentiment, priority) if os.getenv('FALLBACK_LOCAL_REPLY','1')=='1' else "[GEMINI_TIMEOUT]"
         text = _gemini_extract_text(resp).strip()
         if text:
             log.info("Gemini response generated", extra={"model": model_name})
@@ -139,31 +834,137 @@ def _generate_gemini(subject: str, body: str, sentiment: str, priority: str, rag
         LAST_GEMINI_ERROR = {
             "error_type": type(e).__name__,
             "error_message": str(e),
-            "model": os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'),
+            "model": CONFIG.gemini_model,
             "have_key": bool(os.getenv('GOOGLE_API_KEY')),
             "prompt_chars": len(prompt),
-            "ts": __import__('datetime').datetime.now(__import__('datetime').timezone.utc).timestamp()
+            "ts": time.time()  # UTC epoch seconds
         }
         log.error("Gemini generation failed", exc_info=e, extra={k: v for k, v in LAST_GEMINI_ERROR.items() if k != 'prompt_chars'})
         return _local_fallback_reply(subject, body, sentiment, priority) if os.getenv('FALLBACK_LOCAL_REPLY','1')=='1' else "[GEMINI_ERROR]"
 
-def _openrouter_call(prompt: str, test_mode: bool=False) -> str:
+# Persistent HTTP client for OpenRouter: a fresh httpx.Client per call paid
+# TLS handshake + pool setup on every reply. Lazy singleton; http2 is used
+# when the h2 extra is installed.
+_httpx_client = None
+_httpx_client_lock = threading.Lock()
+
+
+def _get_httpx_client():
+    global _httpx_client
+    if _httpx_client is None:
+        with _httpx_client_lock:
+            if _httpx_client is None:
+                import atexit
+                import httpx
+                limits = httpx.Limits(
+                    max_keepalive_connections=32, max_connections=64, keepalive_expiry=60.0)
+                # granular timeouts so a stalled read actually closes the
+                # socket (a plain wall-clock future leaves the request running
+                # and billing in the background)
+                timeout = httpx.Timeout(
+                    connect=2.0, read=CONFIG.openrouter_timeout_s, write=5.0, pool=2.0)
+                try:
+                    client = httpx.Client(http2=True, limits=limits, timeout=timeout)
+                except ImportError:  # h2 not installed; keep-alive still helps
+                    client = httpx.Client(limits=limits, timeout=timeout)
+                atexit.register(client.close)
+                _httpx_client = client
+    return _httpx_client
+
+
+def _or_timeout(read_s: float):
+    """Per-call httpx.Timeout: tight connect/write/pool, caller-chosen read."""
     import httpx
+    return httpx.Timeout(connect=2.0, read=read_s, write=5.0, pool=2.0)
+
+
+class _TokenBucket:
+    """Thread-safe token bucket: burst up to capacity, refill_per_s sustained.
+
+    Replaces min-interval spacing, which fully serialized threads on one lock
+    and allowed no burst at all. Waiters sleep on a Condition until their
+    token accrues, so the common (token available) path is a single lock hop.
+    """
+
+    def __init__(self, capacity: float, refill_per_s: float):
+        self.capacity = float(capacity)
+        self.refill_per_s = float(refill_per_s)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.cond = threading.Condition()
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_s)
+                self.updated = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return True
+                wait_s = (1.0 - self.tokens) / self.refill_per_s
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return False
+                    wait_s = min(wait_s, remaining)
+                self.cond.wait(wait_s)
+
+
+# Two windows, per the provider's short- and long-window quotas: per-second
+# (defaults to the old min-interval pacing) and per-minute. A call must take
+# a token from both.
+_OR_QPS = float(os.getenv('OPENROUTER_QPS', str(1000.0 / CONFIG.openrouter_min_interval_ms)))
+_OR_QPM = float(os.getenv('OPENROUTER_QPM', '30'))
+_OR_BUCKETS = (
+    _TokenBucket(capacity=max(1.0, _OR_QPS * 2), refill_per_s=_OR_QPS),
+    _TokenBucket(capacity=max(1.0, _OR_QPM), refill_per_s=_OR_QPM / 60.0),
+)
+
+
+def _backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """Full-jitter exponential delay for 1-based attempt N.
+
+    random.uniform(0, base * 2**(N-1)) capped at OPENROUTER_BACKOFF_CAP_S;
+    desynchronizes retrying workers so they don't re-collide on the limiter.
+    A server-provided Retry-After acts as a floor, never less.
+    """
+    delay = random.uniform(
+        0, min(CONFIG.openrouter_backoff_cap_s, CONFIG.openrouter_backoff_base_s * (2 ** (attempt - 1))))
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            pass
+    return delay
+
+
+def _sleep_backoff(attempt: int, retry_after: str | None = None):
+    time.sleep(_backoff_delay(attempt, retry_after))
+
+
+def _openrouter_call(prompt: str, test_mode: bool=False, *,
+                     max_tokens: int | None = None,
+                     temperature: float | None = None) -> str:
     api_key = os.getenv('OPENROUTER_API_KEY')
     if not api_key:
         raise RuntimeError('missing OPENROUTER_API_KEY')
-    model = os.getenv('OPENROUTER_MODEL', 'openrouter/sonoma-sky-alpha')
-    endpoint = os.getenv('OPENROUTER_BASE', 'https://openrouter.ai/api/v1/chat/completions')
-    timeout_s = float(os.getenv('OPENROUTER_TIMEOUT', os.getenv('LLM_TIMEOUT', '10')))
-    max_tokens = int(os.getenv('OPENROUTER_MAX_TOKENS', '512'))
-    min_interval_ms = int(os.getenv('OPENROUTER_MIN_INTERVAL_MS', '1200'))  # ~0.8 QPS by default
-    jitter_ms = int(os.getenv('OPENROUTER_JITTER_MS', '120'))
+    model = CONFIG.openrouter_model
+    endpoint = CONFIG.openrouter_base
+    timeout_s = CONFIG.openrouter_timeout_s
+    # Retry-path overrides arrive as kwargs; mutating os.environ for them
+    # leaked half-applied settings into concurrent calls on other threads.
+    if max_tokens is None:
+        max_tokens = CONFIG.openrouter_max_tokens
+    if temperature is None:
+        temperature = CONFIG.openrouter_temperature
     headers = {
         'Authorization': f'Bearer {api_key}',
         'Content-Type': 'application/json',
         # Recommended optional headers for OpenRouter analytics (safe defaults)
-        'HTTP-Referer': os.getenv('OPENROUTER_REFERRER','http://localhost'),
-        'X-Title': os.getenv('OPENROUTER_APP_NAME','SupportAssistant')
+        'HTTP-Referer': CONFIG.openrouter_referrer,
+        'X-Title': CONFIG.openrouter_app_name
     }
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
@@ -172,80 +973,67 @@ def _openrouter_call(prompt: str, test_mode: bool=False) -> str:
     payload = {
         "model": model,
         "messages": messages,
-        "temperature": float(os.getenv('OPENROUTER_TEMPERATURE','0.4'))
-        ,"max_tokens": max_tokens
+        "temperature": temperature,
+        "max_tokens": max_tokens
     }
     log = logging.getLogger(__name__)
-    # Short-circuit if we're in a cooldown window (after repeated 429s)
-    global _or_cooldown_until
-    now_mono = time.monotonic()
-    if now_mono < _or_cooldown_until:
+    # Short-circuit if we're in a cooldown window (after repeated 429s),
+    # checked before taking rate tokens so cooled-down calls cost nothing
+    if _breaker_get():
         raise RuntimeError('or_http_429_cooldown')
-    # Respect a minimal spacing between calls to avoid 429 bursts
-    global _last_or_ts
-    with _rate_lock:
-      now = time.monotonic()
-      elapsed_ms = (now - _last_or_ts) * 1000.0
-      wait_ms = min_interval_ms - elapsed_ms
-      if wait_ms > 0:
-          # add small jitter to avoid thundering herd if multiple threads wait
-          wait = (wait_ms + random.uniform(0, max(1, jitter_ms))) / 1000.0
-          time.sleep(wait)
-      _last_or_ts = time.monotonic()
-
-    with httpx.Client(timeout=timeout_s) as client:
-        attempts = 0
-        while True:
-            attempts += 1
-            resp = client.post(endpoint, headers=headers, json=payload)
-            if resp.status_code == 429:
-                # Rate limited. Respect Retry-After if provided, else exponential-ish backoff.
-                retry_after = resp.headers.get('retry-after') or resp.headers.get('Retry-After')
-                try:
-                    backoff_s = float(retry_after) if retry_after is not None else float(os.getenv('OPENROUTER_RATE_LIMIT_BACKOFF_S', '5'))
-                except ValueError:
-                    backoff_s = float(os.getenv('OPENROUTER_RATE_LIMIT_BACKOFF_S', '5'))
-                backoff_s = max(1.0, backoff_s) + random.uniform(0, 0.5)
-                log.warning('OpenRouter 429 rate limited; backing off', extra={'backoff_s': round(backoff_s,2), 'attempt': attempts})
-                if attempts >= 2:
-                    # enter cooldown to avoid hammering for a while
-                    cooldown_s = float(os.getenv('OPENROUTER_COOLDOWN_S', '60'))
-                    with _rate_lock:
-                        _or_cooldown_until = time.monotonic() + max(5.0, cooldown_s)
-                    raise RuntimeError('or_http_429: cooldown')
-                time.sleep(backoff_s)
-                # After sleeping, also space next call a bit
-                with _rate_lock:
-                    _last_or_ts = time.monotonic()
-                continue
-            if resp.status_code >= 400:
-                raise RuntimeError(f'or_http_{resp.status_code}: {resp.text[:160]}')
-            data = resp.json()
-            choice = (data.get('choices') or [{}])[0]
-            msg = (choice.get('message') or {})
-            content = msg.get('content')
-            # Some providers may return a list of segments; join any text-like fields
-            if isinstance(content, list):
-                parts: list[str] = []
-                for part in content:
-                    if isinstance(part, dict):
-                        for k in ('text', 'content', 'value'):
-                            v = part.get(k)
-                            if isinstance(v, str) and v.strip():
-                                parts.append(v.strip())
-                    elif isinstance(part, str) and part.strip():
-                        parts.append(part.strip())
-                content = "\n".join(parts).strip()
-            elif isinstance(content, str):
-                content = content.strip()
-            else:
-                content = ''
-            if not content:
-                # try refusal or other fields
-                ref = msg.get('refusal')
-                if isinstance(ref, str) and ref.strip():
-                    content = ref.strip()
-            return content
+    # Rate gate: take one token from each window's bucket (blocks until due)
+    for bucket in _OR_BUCKETS:
+        bucket.acquire()
+
+    client = _get_httpx_client()
+    attempts = 0
+    while True:
+        attempts += 1
+        resp = client.post(endpoint, headers=headers, json=payload, timeout=_or_timeout(timeout_s))
+        if resp.status_code == 429:
+            # Rate limited: full-jitter exponential backoff, Retry-After as floor.
+            if attempts >= CONFIG.openrouter_max_attempts:
+                # enter cooldown (shared across workers when Redis is up)
+                _breaker_set(max(5.0, CONFIG.openrouter_cooldown_s))
+                raise RuntimeError('or_http_429: cooldown')
+            retry_after = resp.headers.get('retry-after') or resp.headers.get('Retry-After')
+            backoff_s = _backoff_delay(attempts, retry_after)
+            log.warning('OpenRouter 429 rate limited; backing off', extra={'backoff_s': round(backoff_s,2), 'attempt': attempts})
+            time.sleep(backoff_s)
+            continue
+        if resp.status_code >= 500 and attempts < CONFIG.openrouter_max_attempts:
+            # transient upstream errors get the same jittered retry ladder
+            log.warning('OpenRouter 5xx; retrying', extra={'status': resp.status_code, 'attempt': attempts})
+            _sleep_backoff(attempts)
+            continue
+        if resp.status_code >= 400:
+            raise RuntimeError(f'or_http_{resp.status_code}: {resp.text[:160]}')
+        data = resp.json()
+        choice = (data.get('choices') or [{}])[0]
+        msg = (choice.get('message') or {})
+        content = msg.get('content')
+        # Some providers may return a list of segments; join any text-like fields
+        if isinstance(content, list):
+            parts: list[str] = []
+            for part in content:
+                if isinstance(part, dict):
+                    for k in ('text', 'content', 'value'):
+                        v = part.get(k)
+                        if isinstance(v, str) and v.strip():
+                            parts.append(v.strip())
+                elif isinstance(part, str) and part.strip():
+                    parts.append(part.strip())
+            content = "\n".join(parts).strip()
+        elif isinstance(content, str):
+            content = content.strip()
+        else:
+            content = ''
+        if not content:
+            # try refusal or other fields
+            ref = msg.get('refusal')
+            if isinstance(ref, str) and ref.strip():
+                content = ref.strip()
+        return content
 
 def _generate_openrouter(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]) -> str:
     global LAST_OR_ERROR
@@ -254,16 +1042,26 @@ def _generate_openrouter(subject: str, body: str, sentiment: str, priority: str,
         return _local_fallback_reply(subject, body, sentiment, priority)
     if not os.getenv('OPENROUTER_API_KEY'):
         return '[OPENROUTER_UNAVAILABLE]'
+    if time.monotonic() < _or_backoff['until_mono']:
+        log.info('OpenRouter quota backoff active; skipping call', extra={'level': _or_backoff['level']})
+        if os.getenv('CHAIN_FALLBACK_GEMINI','1')=='1' and os.getenv('GOOGLE_API_KEY') and GEMINI_AVAILABLE:
+            try:
+                return _generate_gemini(subject, body, sentiment, priority, rag_results)
+            except Exception:
+                pass
+        return _local_fallback_reply(subject, body, sentiment, priority) if os.getenv('FALLBACK_LOCAL_REPLY','1')=='1' else '[OPENROUTER_QUOTA_BACKOFF]'
     context = build_context(rag_results)
     # Truncate overly long body to protect token/credit usage
-    max_chars_body = int(os.getenv('OPENROUTER_MAX_BODY_CHARS','4000'))
+    max_chars_body = CONFIG.openrouter_max_body_chars
     orig_body = body
     if len(body) > max_chars_body:
         body = body[:max_chars_body] + "\n...[truncated]"
-    prompt = (
-        f"Context:\n{context}\n\n"
-        f"Subject: {subject}\nSentiment: {sentiment}\nPriority: {priority}\nCustomer email (may be truncated):\n{body}\n\nDraft a helpful support reply.".strip()
-    )
+    prompt = _openrouter_prompt(context, subject, sentiment, priority, body)
+    prompt = _shrink_prompt(
+        prompt, context, body,
+        lambda c, b: _openrouter_prompt(c, subject, sentiment, priority, b),
+        max_out_tokens=CONFIG.openrouter_max_tokens,
+        model_ctx=CONFIG.openrouter_model_ctx)
     try:
         try:
             reply = _openrouter_call(prompt)
@@ -275,35 +1073,31 @@ def _generate_openrouter(subject: str, body: str, sentiment: str, priority: str,
                 retry_prompt = (
                     f"Subject: {subject}\nSentiment: {sentiment}\nPriority: {priority}\nCustomer email:\n{short_body}\n\nGive a concise helpful support reply (<=120 words)."
                 )
-                os.environ['OPENROUTER_MAX_TOKENS'] = os.environ.get('OPENROUTER_RETRY_MAX_TOKENS','256')
-                reply = _openrouter_call(retry_prompt)
+                reply = _openrouter_call(
+                    retry_prompt,
+                    max_tokens=CONFIG.openrouter_retry_max_tokens)
             else:
                 raise
         if reply and reply.strip():
+            _or_backoff_reset()
             return reply.strip()
         # Retry once with a stricter prompt and lower temperature to avoid empty outputs
         LAST_OR_ERROR = {
             'error_type': 'EmptyOutput',
             'error_message': 'OpenRouter returned empty content on first attempt',
-            'model': os.getenv('OPENROUTER_MODEL','openrouter/sonoma-sky-alpha'),
-            'ts': __import__('datetime').datetime.now(__import__('datetime').timezone.utc).timestamp(),
+            'model': CONFIG.openrouter_model,
+            'ts': time.time(),  # UTC epoch seconds
         }
         retry_prompt = (
             f"Subject: {subject}\nSentiment: {sentiment}\nPriority: {priority}\n"
             f"Customer email (may be truncated):\n{(orig_body[:1500] + '\n...[hard-truncated]') if len(orig_body) > 1500 else orig_body}\n\n"
             "Write a helpful, plain-text support reply. Do not return an empty response."
         )
-        # Temporarily nudge temperature down for retry
-        old_temp = os.environ.get('OPENROUTER_TEMPERATURE')
-        os.environ['OPENROUTER_TEMPERATURE'] = '0.2'
-        try:
-            retry_reply = _openrouter_call(retry_prompt)
-        finally:
-            if old_temp is None:
-                os.environ.pop('OPENROUTER_TEMPERATURE', None)
-            else:
-                os.environ['OPENROUTER_TEMPERATURE'] = old_temp
+        # Lower temperature for the retry only; passed per-call so concurrent
+        # requests keep their own settings
+        retry_reply = _openrouter_call(retry_prompt, temperature=0.2)
         if retry_reply and retry_reply.strip():
+            _or_backoff_reset()
             return retry_reply.strip()
         # As a last resort, fall back
         if os.getenv('CHAIN_FALLBACK_GEMINI','1')=='1' and os.getenv('GOOGLE_API_KEY') and GEMINI_AVAILABLE:
@@ -315,13 +1109,15 @@ def _generate_openrouter(subject: str, body: str, sentiment: str, priority: str,
     except Exception as e:  # pragma: no cover
         # For transient conditions, bubble up so callers like the queue worker can re-enqueue
         msg = (str(e) or '').lower()
+        if 'or_http_429' in msg or 'or_http_402' in msg:
+            _or_backoff_hit()
         if any(k in msg for k in ['or_http_429', 'or_http_429_cooldown', 'timeout', 'or_http_5']):
             raise
         LAST_OR_ERROR = {
             'error_type': type(e).__name__,
             'error_message': str(e),
-            'model': os.getenv('OPENROUTER_MODEL','openrouter/sonoma-sky-alpha'),
-            'ts': __import__('datetime').datetime.now(__import__('datetime').timezone.utc).timestamp()
+            'model': CONFIG.openrouter_model,
+            'ts': time.time()  # UTC epoch seconds
         }
         log.error('OpenRouter generation failed', exc_info=e, extra={k:v for k,v in LAST_OR_ERROR.items() if k!='prompt_chars'})
         # Optional chained fallback to Gemini if configured
@@ -332,28 +1128,148 @@ def _generate_openrouter(subject: str, body: str, sentiment: str, priority: str,
                 pass
         return _local_fallback_reply(subject, orig_body, sentiment, priority) if os.getenv('FALLBACK_LOCAL_REPLY','1')=='1' else '[OPENROUTER_ERROR]'
 
+# Provider dispatch table: (primary, secondary) per LLM_PROVIDER value. Built
+# once here (after both generators exist) so the hot path does a dict lookup
+# instead of re-reading env and doing set-membership checks per request.
+_PROVIDER_MAP: Dict[str, tuple] = {
+    'gemini': (_generate_gemini, _generate_openrouter),
+    'openrouter': (_generate_openrouter, _generate_gemini),
+    'or': (_generate_openrouter, _generate_gemini),
+}
+_DEFAULT_PROVIDER_PAIR = _PROVIDER_MAP['gemini']
+
+
+# Streaming generation: waiting for the full completion blocks callers for
+# the whole generation time, while first tokens are usually ready in a
+# fraction of it. These generators yield text as the provider produces it;
+# the deadline is an idle gap between chunks (a healthy long reply keeps
+# streaming) rather than a wall-clock cap.
+STREAM_IDLE_TIMEOUT_S = float(os.getenv('LLM_STREAM_IDLE_TIMEOUT_S', '10'))
+_STREAM_END = object()
+
+
+def _iter_with_idle_timeout(iterator, idle_s: float):
+    ex = _get_timeout_executor()
+    while True:
+        item = ex.submit(next, iterator, _STREAM_END).result(timeout=idle_s)
+        if item is _STREAM_END:
+            return
+        yield item
+
+
+def _gemini_stream(prompt: str):
+    model = _get_model(CONFIG.gemini_model)
+    stream = model.generate_content(prompt, stream=True)  # type: ignore
+    for chunk in _iter_with_idle_timeout(iter(stream), STREAM_IDLE_TIMEOUT_S):
+        text = _gemini_extract_text(chunk)
+        if text:
+            yield text
+
+
+def _openrouter_stream(prompt: str):
+    api_key = os.getenv('OPENROUTER_API_KEY')
+    if not api_key:
+        raise RuntimeError('missing OPENROUTER_API_KEY')
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json',
+        'HTTP-Referer': CONFIG.openrouter_referrer,
+        'X-Title': CONFIG.openrouter_app_name,
+    }
+    payload = {
+        "model": CONFIG.openrouter_model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": CONFIG.openrouter_temperature,
+        "max_tokens": CONFIG.openrouter_max_tokens,
+        "stream": True,
+    }
+    client = _get_httpx_client()
+    with client.stream('POST', CONFIG.openrouter_base, headers=headers, json=payload,
+                       timeout=_or_timeout(CONFIG.openrouter_timeout_s)) as resp:
+        if resp.status_code >= 400:
+            raise RuntimeError(f'or_http_{resp.status_code}')
+        for line in _iter_with_idle_timeout(resp.iter_lines(), STREAM_IDLE_TIMEOUT_S):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[5:].strip()
+            if data == '[DONE]':
+                break
+            try:
+                delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+            except (ValueError, KeyError, IndexError):
+                continue
+            if delta:
+                yield delta
+
+
+def generate_response_stream(subject: str, body: str, sentiment: str, priority: str, rag_results: List[tuple]):
+    """Yield the reply incrementally so callers can flush text as it arrives.
+
+    Any failure before the first chunk degrades to a single chunk from the
+    regular generate_response pipeline (caches, backoff, fallback), so every
+    consumer always receives a complete reply. A failure mid-stream stops the
+    generator; the partial text already flushed stands.
+    """
+    provider = CONFIG.provider
+    context = build_context(rag_results)
+    produced = False
+    try:
+        if provider in {'openrouter', 'or'}:
+            prompt = _openrouter_prompt(context, subject, sentiment, priority, body)
+            source = _openrouter_stream(prompt)
+        else:
+            if os.getenv('GEMINI_FORCE_DISABLE') == '1' or not GEMINI_AVAILABLE or not os.getenv('GOOGLE_API_KEY'):
+                raise RuntimeError('gemini_unavailable')
+            prompt = _gemini_prompt_prefix(context) + _USER_TEMPLATE.format(
+                subject=subject, sentiment=sentiment, priority=priority, body=body)
+            source = _gemini_stream(prompt)
+        for piece in source:
+            produced = True
+            yield piece
+    except Exception as e:
+        if produced:  # partial reply already flushed; don't append a second one
+            logging.getLogger(__name__).warning("llm_stream_interrupted", exc_info=e)
+            return
+        yield generate_response(subject, body, sentiment, priority, rag_results)
+
+
 def ai_diagnostics() -> Dict[str, Any]:  # pragma: no cover
-    provider = os.getenv('LLM_PROVIDER','gemini').lower()
+    provider = CONFIG.provider
+    with _reply_cache_lock:
+        cache_stats = {
+            'hits': _reply_cache_stats['hits'],
+            'misses': _reply_cache_stats['misses'],
+            'size': len(_reply_cache),
+        }
     base = {
         'provider': provider,
-        'using_local_fallback': os.getenv('FALLBACK_LOCAL_REPLY','1')=='1'
+        'using_local_fallback': os.getenv('FALLBACK_LOCAL_REPLY','1')=='1',
+        'reply_cache': cache_stats,
+        'semantic_cache': semantic_cache.stats()
     }
     if provider in {'openrouter','or'}:
         base.update({
-            'model': os.getenv('OPENROUTER_MODEL','openrouter/sonoma-sky-alpha'),
+            'model': CONFIG.openrouter_model,
             'has_key': bool(os.getenv('OPENROUTER_API_KEY')),
             'last_error': LAST_OR_ERROR,
-            'timeout_default_s': float(os.getenv('OPENROUTER_TIMEOUT', os.getenv('LLM_TIMEOUT','10')))
+            'timeout_default_s': CONFIG.openrouter_timeout_s,
+            'quota_backoff': {
+                'level': _or_backoff['level'],
+                'remaining_s': round(max(0.0, _or_backoff['until_mono'] - time.monotonic()), 1)
+            }
         })
         return base
     # gemini fallback
     base.update({
         'gemini_available': GEMINI_AVAILABLE,
         'has_gemini_key': bool(os.getenv('GOOGLE_API_KEY')),
-        'gemini_model': os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'),
+        'gemini_model': CONFIG.gemini_model,
         'last_error': LAST_GEMINI_ERROR,
-        'timeout_default_s': float(os.getenv('GEMINI_TIMEOUT', '6')),
+        'timeout_default_s': CONFIG.gemini_timeout_s,
         'force_disabled': os.getenv('GEMINI_FORCE_DISABLE') == '1',
-        'backoff_seconds': float(os.getenv('GEMINI_BACKOFF_SECONDS','600'))
+        'backoff_seconds': CONFIG.gemini_backoff_s
     })
     return base
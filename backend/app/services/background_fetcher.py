@@ -5,15 +5,22 @@ import logging
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 from .retrievers import fetch_any, get_runtime_provider
-from .nlp import analyze_sentiment, determine_priority, extract_info
+from .nlp_cache import NLP_EXECUTOR, cached_analyze, cached_determine
 from .auto_responder import generate_response
-from .queue_worker import enqueue_email
+from .queue_worker import enqueue_email, enqueue_email_batch
+from ..models.email_model import Email
 from ..db.database import SessionLocal
-from .email_service import create_email
-from .email_service import email_exists, email_exists_external
-from ..schemas.email import EmailCreate
+from .email_service import bulk_insert_emails, existing_external_ids, existing_email_pairs
+from .imap_idle import wait_for_new_mail
+from sqlalchemy import func
 from email.utils import parsedate_to_datetime
-from datetime import datetime, timezone
+
+
+def _utc_iso() -> str:
+    """Timezone-aware ISO timestamp for the fetch summary (utcnow is naive
+    and deprecated; this also skips the string concat per cycle)."""
+    return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+
 
 def _coerce_received(value):
     if isinstance(value, datetime):
@@ -33,6 +40,38 @@ last_fetch_summary = {"ts": None, "fetched": 0, "provider": None}
 
 POLL_INTERVAL = int(os.getenv('EMAIL_POLL_INTERVAL', '120'))  # seconds
 
+
+def _classify_and_enqueue(items: list[tuple[int, str]]):
+    """Classify a fetch cycle's rows and hand them to the generation queue.
+
+    Runs on the shared NLP executor so sentiment/priority work never blocks
+    the fetch thread between IMAP polls; one session and one commit cover the
+    whole batch. Classified priorities are what the generation queue orders by,
+    so enqueueing happens here rather than in the fetch loop.
+    """
+    log = logging.getLogger(__name__)
+    db: Session = SessionLocal()
+    try:
+        queued: list[tuple[int, str]] = []
+        for email_id, body in items:
+            try:
+                sentiment = cached_analyze(body)
+                priority = cached_determine(body)
+                db.query(Email).filter(Email.id == email_id).update(
+                    {"sentiment": sentiment, "priority": priority},
+                    synchronize_session=False,
+                )
+                queued.append((email_id, priority))
+            except Exception:
+                log.exception("classify_item_error", extra={"email_id": email_id})
+        db.commit()
+        enqueue_email_batch(queued)
+    except Exception:
+        log.exception("classify_batch_error")
+    finally:
+        db.close()
+
+
 def _loop():
     global _running
     log = logging.getLogger(__name__)
@@ -41,45 +80,71 @@ def _loop():
             provider = get_runtime_provider()
             mails = fetch_any(limit=20)
             if mails:
+                # The fetch thread only dedupes and persists raw rows;
+                # classification (and, from it, queueing for generation) moves
+                # to the shared NLP executor so cycle latency is bounded by
+                # IMAP/API time alone. Rows land with a placeholder priority
+                # that the classifier batch overwrites moments later.
                 db: Session = SessionLocal()
-                for m in mails:
-                    sentiment = analyze_sentiment(m['body'])
-                    priority = determine_priority(m['body'])
-                    # Do not call the LLM inline here to avoid bursts. Let the queue worker serialize calls.
-                    auto_resp = None
-                    recv = _coerce_received(m.get('received_at'))
-                    ext_id = m.get('external_id')
-                    if ext_id and email_exists_external(db, ext_id):
-                        continue
-                    if not ext_id and email_exists(db, m['sender'], m['subject'], recv):
-                        continue
-                    email = create_email(db, EmailCreate(
-                        sender=m['sender'],
-                        subject=m['subject'],
-                        body=m['body'],
-                        received_at=recv
-                        ), sentiment, priority, auto_resp, source=provider, external_id=ext_id)
-                    try:
-                        enqueue_email(email.id, priority)
-                    except Exception:
-                        pass
-                db.close()
+                try:
+                    # Two set-building queries dedupe the whole cycle (same
+                    # pattern as the run-once fetch endpoint) instead of one
+                    # or two existence SELECTs per mail.
+                    for m in mails:
+                        m['_recv'] = _coerce_received(m.get('received_at'))
+                    seen_ext = existing_external_ids(db, [m['external_id'] for m in mails if m.get('external_id')])
+                    seen_pairs = existing_email_pairs(db, [(m['sender'], m['subject'], m['_recv']) for m in mails if not m.get('external_id')])
+                    rows = []
+                    for m in mails:
+                        ext_id = m.get('external_id')
+                        if ext_id:
+                            if ext_id in seen_ext:
+                                continue
+                            seen_ext.add(ext_id)  # also dedupes within the batch
+                        else:
+                            triple = (m['sender'], m['subject'], m['_recv'])
+                            if triple in seen_pairs:
+                                continue
+                            seen_pairs.add(triple)  # also dedupes within the batch
+                        # Do not call the LLM inline here to avoid bursts; the
+                        # queue worker serializes calls. Priority is a
+                        # placeholder the classifier batch overwrites.
+                        rows.append({
+                            'sender': m['sender'],
+                            'subject': m['subject'],
+                            'body': m['body'],
+                            'received_at': m['_recv'],
+                            'priority': 'Not urgent',
+                            'source': provider,
+                            'external_id': ext_id,
+                        })
+                    pre_max = db.query(func.max(Email.id)).scalar() or 0
+                    if bulk_insert_emails(db, rows):
+                        new_items = [
+                            (email_id, body)
+                            for email_id, body in db.query(Email.id, Email.body).filter(Email.id > pre_max)
+                        ]
+                        NLP_EXECUTOR.submit(_classify_and_enqueue, new_items)
+                finally:
+                    db.close()
                 log.info("fetch_cycle", extra={"provider":provider, "fetched":len(mails)})
                 last_fetch_summary.update({
-                    "ts": datetime.utcnow().isoformat()+"Z",
+                    "ts": _utc_iso(),
                     "fetched": len(mails),
                     "provider": provider
                 })
             else:
                 log.debug("fetch_cycle_empty", extra={"provider":provider})
                 last_fetch_summary.update({
-                    "ts": datetime.utcnow().isoformat()+"Z",
+                    "ts": _utc_iso(),
                     "fetched": 0,
                     "provider": provider
                 })
         except Exception:
             log.exception("fetch_cycle_error")
-        time.sleep(POLL_INTERVAL)
+        # Blocks in IMAP IDLE when the provider supports it, so new mail cuts
+        # the wait short; otherwise this is the old fixed poll sleep.
+        wait_for_new_mail(POLL_INTERVAL)
 
 def start_background_fetch():
     global _running, _thread
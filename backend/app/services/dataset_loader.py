@@ -5,10 +5,22 @@ from typing import Optional, Dict, Any
 
 from sqlalchemy.orm import Session
 
+from sqlalchemy import func
+
 from ..models.email_model import Email
-from .nlp import analyze_sentiment, determine_priority
+from .email_service import bulk_insert_emails
+# memoized wrappers: support datasets are full of repeated auto-reply /
+# out-of-office bodies, so duplicates skip the classifier entirely
+from .nlp_cache import cached_analyze as analyze_sentiment, cached_determine as determine_priority
 from .queue_worker import enqueue_email
 
+try:  # pandas ships with the ML extras (requirements-ml.txt)
+    import pandas as pd  # type: ignore
+    PANDAS_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    pd = None  # type: ignore
+    PANDAS_AVAILABLE = False
+
 
 DATE_FORMATS = [
     "%d-%m-%Y %H:%M",  # 19-08-2025 00:58
@@ -29,6 +41,69 @@ def _parse_date(raw: str) -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _read_rows_pandas(path: Path) -> tuple[list, int]:
+    """Vectorized CSV read: one pass over columns instead of a Python loop per row.
+
+    Column normalization, empty-row filtering and date parsing all happen as
+    whole-column operations; only the classifiers still run per body (TextBlob
+    is not vectorizable). Returns (rows, error_count) shaped exactly like the
+    csv.DictReader path so bulk_insert_emails sees no difference.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    df.columns = df.columns.str.strip().str.lower()
+    # accept the same date-column aliases as the row-wise path
+    date_col = next((c for c in ('sent_date', 'date', 'received_at') if c in df.columns), None)
+    required = ['sender', 'subject', 'body']
+    for col in required:
+        if col not in df.columns:
+            df[col] = ''
+    for col in required:
+        df[col] = df[col].str.strip()
+    mask = (df['sender'] != '') & (df['subject'] != '') & (df['body'] != '')
+    errors = int((~mask).sum())
+    df = df[mask]
+    if date_col is not None:
+        parsed = pd.to_datetime(df[date_col], format='mixed', dayfirst=True, utc=True, errors='coerce')
+        received = parsed.fillna(pd.Timestamp.now(tz=timezone.utc))
+    else:
+        received = pd.Series(pd.Timestamp.now(tz=timezone.utc), index=df.index)
+    out = df[required].copy()
+    out['received_at'] = received.dt.to_pydatetime()
+    out['sentiment'] = df['body'].map(analyze_sentiment)
+    out['priority'] = df['body'].map(determine_priority)
+    return out.to_dict('records'), errors
+
+
+def _read_rows_csv(path: Path) -> tuple[list, int]:
+    """Row-at-a-time fallback for deployments without the ML extras."""
+    rows = []
+    errors = 0
+    with path.open("r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                sender = row.get("sender") or row.get("Sender")
+                subject = row.get("subject") or row.get("Subject")
+                body = row.get("body") or row.get("Body")
+                sent_date = row.get("sent_date") or row.get("date") or row.get("received_at")
+                if not (sender and subject and body):
+                    errors += 1
+                    continue
+                received_at = _parse_date(sent_date) if sent_date else datetime.now(timezone.utc)
+                body = body.strip()
+                rows.append({
+                    "sender": sender.strip(),
+                    "subject": subject.strip(),
+                    "body": body,
+                    "received_at": received_at,
+                    "sentiment": analyze_sentiment(body),
+                    "priority": determine_priority(body),
+                })
+            except Exception:
+                errors += 1
+    return rows, errors
+
+
 def load_dataset(
     db: Session,
     csv_path: str,
@@ -56,48 +131,16 @@ def load_dataset(
         db.query(Email).delete()
         db.commit()
 
-    loaded = 0
-    errors = 0
-    with path.open("r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        required = {"sender", "subject", "body"}
-        missing = required - set(h.lower() for h in reader.fieldnames or [])
-        # Normalize header names to lower for safety
-        for row in reader:
-            try:
-                sender = row.get("sender") or row.get("Sender")
-                subject = row.get("subject") or row.get("Subject")
-                body = row.get("body") or row.get("Body")
-                sent_date = row.get("sent_date") or row.get("date") or row.get("received_at")
-                if not (sender and subject and body):
-                    errors += 1
-                    continue
-                received_at = _parse_date(sent_date) if sent_date else datetime.now(timezone.utc)
-                sentiment = analyze_sentiment(body)
-                priority = determine_priority(body)
-                email = Email(
-                    sender=sender.strip(),
-                    subject=subject.strip(),
-                    body=body.strip(),
-                    received_at=received_at,
-                    sentiment=sentiment,
-                    priority=priority,
-                    auto_response=None,
-                    status="pending",
-                )
-                db.add(email)
-                db.flush()  # assign id for queuing
-                if generate_responses:
-                    enqueue_email(email.id, priority)
-                loaded += 1
-            except Exception:
-                db.rollback()
-                errors += 1
-            else:
-                # don't commit each time (performance) - batch commit every 100
-                if loaded % 100 == 0:
-                    db.commit()
-        db.commit()
+    if PANDAS_AVAILABLE:
+        rows, errors = _read_rows_pandas(path)
+    else:
+        rows, errors = _read_rows_csv(path)
+    # Single raw executemany instead of per-row ORM add/flush.
+    pre_max = db.query(func.max(Email.id)).scalar() or 0
+    loaded = bulk_insert_emails(db, rows)
+    if generate_responses and loaded:
+        for email_id, priority in db.query(Email.id, Email.priority).filter(Email.id > pre_max):
+            enqueue_email(email_id, priority)
 
     return {
         "loaded": loaded,
@@ -1,49 +1,212 @@
+import codecs
 import imaplib, email
-from email.header import decode_header
+import logging
+import os
+import re
+import threading
+import time
+from email.header import decode_header, make_header
 from datetime import datetime, timezone
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 
 SUPPORT_TERMS = ['support','query','request','help']
 
+log = logging.getLogger(__name__)
 
-def fetch_emails(host: str, user: str, password: str, limit: int = 50) -> List[Dict]:
-    mails = []
+# Persistent IMAP sessions per (host, user): TLS handshake + LOGIN cost
+# hundreds of ms per poll cycle when re-done every call. Checkout pops the
+# entry so concurrent fetchers never share a socket; entries idle longer
+# than the threshold get a NOOP health check first since providers drop
+# quiet sessions silently.
+_IMAP_IDLE_CHECK_S = 300
+_imap_pool: Dict[Tuple[str, str], Tuple[object, float]] = {}
+_imap_pool_lock = threading.Lock()
+
+
+def checkout_imap(host: str, user: str, connect: Callable[[], object]):
+    """Return a live, logged-in IMAP session for (host, user).
+
+    Reuses a pooled session when one exists (NOOP-validated if it sat idle),
+    otherwise calls ``connect`` to build a fresh one. Pair with release_imap
+    on success or discard_imap on error.
+    """
+    with _imap_pool_lock:
+        entry = _imap_pool.pop((host, user), None)
+    if entry is not None:
+        imap, last_used = entry
+        if time.monotonic() - last_used <= _IMAP_IDLE_CHECK_S:
+            return imap
+        try:
+            if imap.noop()[0] == 'OK':
+                return imap
+        except Exception:
+            pass
+        discard_imap(imap)
+    return connect()
+
+
+def release_imap(host: str, user: str, imap):
+    """Park a healthy session back in the pool for the next fetch."""
+    with _imap_pool_lock:
+        displaced = _imap_pool.get((host, user))
+        _imap_pool[(host, user)] = (imap, time.monotonic())
+    if displaced is not None:  # concurrent fetch returned first; drop ours' peer
+        discard_imap(displaced[0])
+
+
+def discard_imap(imap):
+    """Close a broken/displaced session without letting cleanup errors surface."""
+    try:
+        imap.shutdown()
+    except Exception:
+        pass
+
+
+def _build_or_expr(terms: List[str]) -> Tuple[str, ...]:
+    """Prefix-notation OR chain over SUBJECT criteria, built once at import."""
+    args: List[str] = []
+    for term in terms[:-1]:
+        args += ['OR', 'SUBJECT', term]
+    args += ['SUBJECT', terms[-1]]
+    return tuple(args)
+
+
+SEARCH_EXPR = _build_or_expr(SUPPORT_TERMS)
+# cap decoded body work on huge mails (long threads, pasted reports)
+MAX_BODY_BYTES = int(os.getenv('MAX_BODY_BYTES', '262144'))
+# client-side fallback check, one compiled alternation instead of a
+# lowercase + substring scan per term
+_SUPPORT_RE = re.compile('|'.join(map(re.escape, SUPPORT_TERMS)), re.IGNORECASE)
+
+
+# charset name -> CodecInfo: bytes.decode does a name-normalizing registry
+# lookup per call, which shows up under profile when every part of every
+# message decodes; unknown charsets fall back to utf-8 once and are cached
+_codec_cache: dict = {}
+
+
+def decode_text(payload: bytes, charset: Optional[str]) -> str:
+    cs = charset or 'utf-8'
+    ci = _codec_cache.get(cs)
+    if ci is None:
+        try:
+            ci = codecs.lookup(cs)
+        except LookupError:
+            ci = codecs.lookup('utf-8')
+        _codec_cache[cs] = ci
+    return ci.decode(payload, 'ignore')[0]
+
+
+def decode_subject(raw: Optional[str]) -> str:
+    """Decode an RFC 2047 subject, joining all encoded-word fragments.
+
+    Plain-ASCII subjects (the overwhelming majority) bypass the
+    encoded-word machinery entirely; taking only decode_header()[0], as the
+    parsers used to, silently dropped everything after the first fragment.
+    """
+    raw = raw or ''
+    if raw.isascii() and '=?' not in raw:
+        return raw
+    try:
+        return str(make_header(decode_header(raw)))
+    except Exception:
+        return raw
+
+
+def _uid_search(imap) -> List[bytes]:
+    """One UID SEARCH with the subject filter pushed to the server.
+
+    The OR-chained SUBJECT criteria mean non-support mail is never transferred
+    at all. UIDs (not sequence numbers) keep the later fetch stable if the
+    mailbox mutates between search and fetch. Falls back to ALL when the
+    server rejects the OR chain; the client-side filter below still applies.
+    """
+    try:
+        status, data = imap.uid('SEARCH', None, *SEARCH_EXPR)
+        if status == 'OK':
+            return data[0].split()
+    except Exception:
+        log.warning("imap_uid_search_filtered_failed", exc_info=True)
+    status, data = imap.uid('SEARCH', None, 'ALL')
+    if status != 'OK':
+        return []
+    return data[0].split()
+
+
+def _parse_message(raw: bytes) -> Optional[Dict]:
+    msg = email.message_from_bytes(raw)
+    subject = decode_subject(msg.get('Subject'))
+    sender = msg.get('From') or ''
+    date_hdr = msg.get('Date')
+    body = ''
+    if msg.is_multipart():
+        # collect-then-join instead of += so many-part mails stay linear,
+        # with a byte budget so one pathological mail can't eat the batch
+        chunks: List[str] = []
+        budget = MAX_BODY_BYTES
+        for part in msg.walk():
+            # maintype gate first so attachment/container parts cost one
+            # header lookup, not disposition assembly + type parsing
+            if part.get_content_maintype() != 'text':
+                continue
+            ctype = part.get_content_type()
+            disp = str(part.get('Content-Disposition'))
+            if ctype == 'text/plain' and 'attachment' not in disp:
+                payload = part.get_payload(decode=True)
+                if not payload:
+                    continue
+                if len(payload) > budget:
+                    payload = payload[:budget]
+                budget -= len(payload)
+                chunks.append(decode_text(payload, part.get_content_charset()))
+                if budget <= 0:
+                    break
+        body = ''.join(chunks)
+    else:
+        payload = msg.get_payload(decode=True)
+        if payload:
+            body = decode_text(payload[:MAX_BODY_BYTES], msg.get_content_charset())
+    if not _SUPPORT_RE.search(subject):
+        return None
+    return {
+        'sender': sender,
+        'subject': subject,
+        'body': body,
+        'received_at': date_hdr or datetime.now(timezone.utc).isoformat()
+    }
+
+
+def _connect(host: str, user: str, password: str):
     imap = imaplib.IMAP4_SSL(host)
     imap.login(user, password)
-    imap.select('INBOX')
-    status, messages = imap.search(None, 'ALL')
-    if status != 'OK':
-        return mails
-    ids = messages[0].split()[-limit:]
-    for num in reversed(ids):
-        res, msg_data = imap.fetch(num, '(RFC822)')
-        if res != 'OK':
-            continue
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-                subject, encoding = decode_header(msg.get('Subject') or '')[0]
-                if isinstance(subject, bytes):
-                    subject = subject.decode(encoding or 'utf-8', errors='ignore')
-                sender = msg.get('From') or ''
-                date_hdr = msg.get('Date')
-                body = ''
-                if msg.is_multipart():
-                    for part in msg.walk():
-                        ctype = part.get_content_type()
-                        disp = str(part.get('Content-Disposition'))
-                        if ctype == 'text/plain' and 'attachment' not in disp:
-                            charset = part.get_content_charset() or 'utf-8'
-                            body += part.get_payload(decode=True).decode(charset, errors='ignore')
-                else:
-                    charset = msg.get_content_charset() or 'utf-8'
-                    body = msg.get_payload(decode=True).decode(charset, errors='ignore') if msg.get_payload(decode=True) else ''
-                if any(t in subject.lower() for t in SUPPORT_TERMS):
-                    mails.append({
-                        'sender': sender,
-                        'subject': subject,
-                        'body': body,
-                        'received_at': date_hdr or datetime.now(timezone.utc).isoformat()
-                    })
-    imap.logout()
+    return imap
+
+
+def fetch_emails(host: str, user: str, password: str, limit: int = 50) -> List[Dict]:
+    mails = []
+    imap = checkout_imap(host, user, lambda: _connect(host, user, password))
+    try:
+        imap.select('INBOX')
+        uids = _uid_search(imap)[-limit:]
+        if uids:
+            # One UID FETCH for the whole batch instead of a round-trip per
+            # message; on a remote server this collapses N network waits into
+            # one. BODY.PEEK[] avoids setting \Seen as a side effect of polling.
+            res, msg_data = imap.uid('FETCH', b','.join(uids), '(BODY.PEEK[])')
+            if res == 'OK':
+                for response_part in msg_data:
+                    if not isinstance(response_part, tuple):
+                        continue
+                    try:
+                        parsed = _parse_message(response_part[1])
+                    except Exception:
+                        log.warning("imap_parse_failed", exc_info=True)
+                        continue
+                    if parsed:
+                        mails.append(parsed)
+    except Exception:
+        discard_imap(imap)
+        raise
+    release_imap(host, user, imap)
+    mails.reverse()  # newest first, matching the old reversed-ids order
     return mails
@@ -1,16 +1,29 @@
 from sqlalchemy.orm import Session
 from typing import List, Optional, Tuple
-from sqlalchemy import case, or_
+from sqlalchemy import case, func, insert, or_, text
+from email.utils import parseaddr
 from ..models.email_model import Email
 from ..schemas.email import EmailCreate
 from datetime import datetime, timedelta, timezone
 
 
+def _sender_domain(sender: Optional[str]) -> Optional[str]:
+    if not sender:
+        return None
+    # fetched mail carries raw From headers ("Alice <alice@example.com>");
+    # extract the addr-spec first or the domain keeps the trailing '>'
+    addr = parseaddr(sender)[1] or sender
+    if '@' in addr:
+        return addr.rsplit('@', 1)[-1].strip().lower()
+    return None
+
+
 def create_email(db: Session, payload: EmailCreate, sentiment: str, priority: str, auto_response: Optional[str], source: str='unknown', external_id: Optional[str]=None) -> Email:
     email = Email(
         sender=payload.sender,
         subject=payload.subject,
         body=payload.body,
+        sender_domain=_sender_domain(payload.sender),
     received_at=payload.received_at or datetime.now(timezone.utc),
         sentiment=sentiment,
         priority=priority,
@@ -24,6 +37,53 @@ def create_email(db: Session, payload: EmailCreate, sentiment: str, priority: st
     db.refresh(email)
     return email
 
+# executemany chunk size: bounds the parameter buffer on very large datasets
+# without measurable cost on small ones; all chunks share one transaction.
+BULK_INSERT_CHUNK = 500
+
+
+def create_emails_bulk(db: Session, rows: List[dict]) -> int:
+    """Insert many emails in one Core executemany, bypassing ORM flush machinery.
+
+    ORM inserts pay per-instance attribute tracking and a flush per batch;
+    Core insert() executemany is an order of magnitude faster on SQLite and,
+    unlike hand-written qmark SQL, renders the right paramstyle for every
+    dialect (psycopg2 expects %s). Keep the ORM for single-record
+    reads/updates; use this for ingestion bursts.
+
+    Each row dict needs sender/subject/body; remaining columns fall back to
+    the same defaults create_email applies.
+    """
+    if not rows:
+        return 0
+    now = datetime.now(timezone.utc)
+    params = [
+        {
+            'sender': r['sender'],
+            'sender_domain': _sender_domain(r['sender']),
+            'subject': r['subject'],
+            'body': r['body'],
+            'received_at': r.get('received_at') or now,
+            'sentiment': r.get('sentiment'),
+            'priority': r.get('priority'),
+            'auto_response': r.get('auto_response'),
+            'status': r.get('status', 'pending'),
+            'source': r.get('source', 'unknown'),
+            'external_id': r.get('external_id'),
+        }
+        for r in rows
+    ]
+    stmt = insert(Email)
+    for i in range(0, len(params), BULK_INSERT_CHUNK):
+        db.execute(stmt, params[i:i + BULK_INSERT_CHUNK])
+    db.commit()
+    return len(params)
+
+
+# original name of the bulk path; the ingestion callers still use it
+bulk_insert_emails = create_emails_bulk
+
+
 def email_exists(db: Session, sender: str, subject: str, received_at) -> bool:
     return db.query(Email).filter(Email.sender==sender, Email.subject==subject, Email.received_at==received_at).first() is not None
 
@@ -31,6 +91,36 @@ def email_exists_external(db: Session, external_id: str) -> bool:
     return db.query(Email).filter(Email.external_id==external_id).first() is not None
 
 
+def existing_external_ids(db: Session, external_ids: List[str]) -> set:
+    """Batch variant of email_exists_external: one IN query for a fetch cycle."""
+    if not external_ids:
+        return set()
+    return {r[0] for r in db.query(Email.external_id).filter(Email.external_id.in_(external_ids))}
+
+
+def existing_email_pairs(db: Session, triples: List[tuple]) -> set:
+    """Batch variant of email_exists for messages without an external id.
+
+    Matches the exact (sender, subject, received_at) triples in SQL in a single
+    round-trip and returns the subset of the input triples that already exist,
+    so callers can test (and extend) membership with their own triples. The
+    full triple is the key: the same sender+subject at a different received_at
+    is a new mail (recurring notifications), not a duplicate.
+    """
+    if not triples:
+        return set()
+    from sqlalchemy import and_
+    conds = [and_(Email.sender == s, Email.subject == subj, Email.received_at == recv)
+             for s, subj, recv in triples]
+    # the DB hands received_at back naive (tz dropped on storage); normalize
+    # both sides to naive wall-clock so set membership agrees with SQL equality
+    def _naive(dt):
+        return dt.replace(tzinfo=None) if getattr(dt, 'tzinfo', None) else dt
+    found = {(r[0], r[1], _naive(r[2]))
+             for r in db.query(Email.sender, Email.subject, Email.received_at).filter(or_(*conds))}
+    return {t for t in triples if (t[0], t[1], _naive(t[2])) in found}
+
+
 def list_emails(
     db: Session,
     status: Optional[str]=None,
@@ -41,7 +131,8 @@ def list_emails(
     limit: int = 100,
     offset: int = 0,
     source: Optional[str] = None,
-    exclude_sources: Optional[List[str]] = None
+    exclude_sources: Optional[List[str]] = None,
+    fuzzy: bool = False
 ) -> Tuple[List[Email], int]:
     """List emails with optional filters.
 
@@ -49,7 +140,10 @@ def list_emails(
         status/priority/sentiment: categorical filters
         q_search: free text token(s) search (ILIKE).
         domain: filter by sender email domain (case-insensitive, strips leading '@').
+        fuzzy: AND-match each token of q_search independently (order/adjacency free).
     q_search: simple case-insensitive containment on subject/body/sender.
+    On Postgres, q_search uses native full-text search (tsvector + websearch_to_tsquery)
+    so the match is an index probe instead of an ILIKE scan.
     """
     q = db.query(Email)
     if status:
@@ -60,13 +154,30 @@ def list_emails(
         q = q.filter(Email.sentiment==sentiment)
     if domain:
         dom = domain.lower().lstrip('@')
-        from sqlalchemy import or_ as _or
-        like_exact = f"%@{dom}"
-        like_fragment = f"%@%{dom}%"
-        q = q.filter(_or(Email.sender.ilike(like_exact), Email.sender.ilike(like_fragment)))
+        if '.' in dom:
+            # full domain: indexed equality on the denormalized column
+            q = q.filter(Email.sender_domain == dom)
+        else:
+            # partial input ("gmail"): containment over the short indexed
+            # column, still far cheaper than wildcard ILIKE over sender
+            q = q.filter(Email.sender_domain.contains(dom))
     if q_search:
-        like = f"%{q_search.lower()}%"
-        q = q.filter((Email.subject.ilike(like)) | (Email.body.ilike(like)) | (Email.sender.ilike(like)))
+        if db.get_bind().dialect.name == 'postgresql':
+            # hits the stored search_tsv generated column and its GIN index
+            # (created in _ensure_pg_indexes); plainto gives plain AND-of-
+            # tokens for fuzzy, websearch keeps quote/OR syntax otherwise
+            tsquery = 'plainto_tsquery' if fuzzy else 'websearch_to_tsquery'
+            q = q.filter(
+                text(f"search_tsv @@ {tsquery}('english', :q_search)")
+            ).params(q_search=q_search)
+        elif fuzzy:
+            # AND of per-token containment; tokens may appear in any field/order
+            for tok in q_search.split():
+                like = f"%{tok}%"
+                q = q.filter((Email.subject.ilike(like)) | (Email.body.ilike(like)) | (Email.sender.ilike(like)))
+        else:
+            like = f"%{q_search}%"
+            q = q.filter((Email.subject.ilike(like)) | (Email.body.ilike(like)) | (Email.sender.ilike(like)))
     if source:
         q = q.filter(Email.source == source)
     if exclude_sources:
@@ -74,11 +185,22 @@ def list_emails(
         # Exclude any rows whose source is in the list
         q = q.filter(~Email.source.in_(exclude_sources))
 
-    total = q.count()
-    # Order: urgent first, then newest
+    # Order: urgent first, then newest. COUNT(*) OVER() rides along on the
+    # page query so the filtered set is scanned once, not once for count and
+    # again for rows.
     priority_order = case((Email.priority == 'Urgent', 0), else_=1)
-    items = q.order_by(priority_order, Email.received_at.desc()).offset(offset).limit(limit).all()
-    return items, total
+    rows = (
+        q.add_columns(func.count().over().label('total'))
+        .order_by(priority_order, Email.received_at.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+    if rows:
+        return [r[0] for r in rows], rows[0][1]
+    # empty page (offset past the end or no matches): one count query settles it
+    total = q.with_entities(func.count(Email.id)).scalar() or 0
+    return [], total
 
 def get_email(db: Session, email_id: int) -> Optional[Email]:
     return db.query(Email).filter(Email.id==email_id).first()
@@ -122,24 +244,35 @@ def mark_sent(db: Session, email_id: int) -> Optional[Email]:
 
 
 def analytics_summary(db: Session, source: Optional[str] = None, exclude_sources: Optional[List[str]] = None):
-    base = db.query(Email)
+    # One conditional-aggregate SELECT instead of ten COUNT queries: every
+    # count was a separate scan of the same filtered set, so the table is now
+    # read once and each tally is a SUM(CASE WHEN ...) over that pass.
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=24)
+
+    def _tally(cond):
+        return func.coalesce(func.sum(case((cond, 1), else_=0)), 0)
+
+    q = db.query(
+        func.count(Email.id),
+        _tally(Email.received_at >= cutoff),
+        _tally(Email.sentiment == 'Positive'),
+        _tally(Email.sentiment == 'Neutral'),
+        _tally(Email.sentiment == 'Negative'),
+        _tally(Email.priority == 'Urgent'),
+        _tally(Email.priority == 'Not urgent'),
+        _tally(Email.status == 'resolved'),
+        _tally(Email.status == 'pending'),
+    )
     if source:
-        base = base.filter(Email.source == source)
+        q = q.filter(Email.source == source)
     if exclude_sources:
-        base = base.filter(~Email.source.in_(exclude_sources))
-
-    total = base.count()
-    now = datetime.now(timezone.utc)
-    last_24 = base.filter(Email.received_at >= now - timedelta(hours=24)).count()
-    by_sentiment = {s: base.filter(Email.sentiment==s).count() for s in ['Positive','Neutral','Negative']}
-    by_priority = {p: base.filter(Email.priority==p).count() for p in ['Urgent','Not urgent']}
-    resolved = base.filter(Email.status=='resolved').count()
-    pending = base.filter(Email.status=='pending').count()
+        q = q.filter(~Email.source.in_(exclude_sources))
+    (total, last_24, pos, neu, neg, urgent, not_urgent, resolved, pending) = q.one()
     return {
         'total': total,
         'last_24h': last_24,
-        'sentiment': by_sentiment,
-        'priority': by_priority,
+        'sentiment': {'Positive': pos, 'Neutral': neu, 'Negative': neg},
+        'priority': {'Urgent': urgent, 'Not urgent': not_urgent},
         'resolved': resolved,
         'pending': pending
     }
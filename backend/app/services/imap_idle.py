@@ -0,0 +1,114 @@
+"""Event-driven wakeups for the background fetcher via IMAP IDLE (RFC 2177).
+
+The poll loop otherwise sleeps a full EMAIL_POLL_INTERVAL between cycles, so a
+mail arriving just after a poll waits up to two minutes for a reply draft.
+With IDLE, a long-lived readonly connection blocks server-side and the sleep
+ends the moment the server pushes an EXISTS — time-to-first-reply drops to
+seconds while the command volume stays the same.
+
+Only the IMAP-backed providers (imap, gmail) can IDLE; for anything else, or
+when imapclient / the IDLE capability is missing, wait_for_new_mail degrades
+to a plain sleep and the loop keeps its polling cadence.
+"""
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+try:  # ships in requirements-base.txt, but keep the usual guard
+    from imapclient import IMAPClient  # type: ignore
+    IMAPCLIENT_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    IMAPClient = None  # type: ignore
+    IMAPCLIENT_AVAILABLE = False
+
+log = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _idle_credentials() -> Optional[Tuple[str, str, str]]:
+    provider = (os.getenv('EMAIL_PROVIDER') or 'imap').lower()
+    if provider == 'gmail':
+        host = 'imap.gmail.com'
+        user = os.getenv('GMAIL_USER') or os.getenv('EMAIL_IMAP_USER')
+        pwd = os.getenv('GMAIL_APP_PASSWORD') or os.getenv('EMAIL_IMAP_PASSWORD')
+    elif provider == 'imap':
+        host = os.getenv('EMAIL_IMAP_HOST')
+        user = os.getenv('EMAIL_IMAP_USER')
+        pwd = os.getenv('EMAIL_IMAP_PASSWORD')
+    else:  # outlook / smtp-inbox have no IMAP endpoint to idle on
+        return None
+    if not (host and user and pwd):
+        return None
+    return host, user, pwd
+
+
+def _drop_client() -> None:
+    global _client
+    with _client_lock:
+        c, _client = _client, None
+    if c is not None:
+        try:
+            c.logout()
+        except Exception:
+            pass
+
+
+def _get_client():
+    """Lazy long-lived IDLE connection; None when IDLE isn't possible."""
+    global _client
+    if not IMAPCLIENT_AVAILABLE:
+        return None
+    creds = _idle_credentials()
+    if creds is None:
+        return None
+    with _client_lock:
+        if _client is not None:
+            return _client
+        host, user, pwd = creds
+        try:
+            c = IMAPClient(host, ssl=True, timeout=float(os.getenv('IMAP_IDLE_CONNECT_TIMEOUT', '10')))
+            c.login(user, pwd)
+            # readonly: the fetch path owns \Seen state, this connection only listens
+            c.select_folder('INBOX', readonly=True)
+            if not c.has_capability('IDLE'):
+                c.logout()
+                return None
+            _client = c
+        except Exception:
+            log.warning("imap_idle_connect_failed", exc_info=True)
+            return None
+        return _client
+
+
+def wait_for_new_mail(timeout: float) -> bool:
+    """Block up to `timeout` seconds, returning early if the server signals
+    new mail. Returns True when an EXISTS arrived, False on a quiet timeout.
+
+    Falls back to time.sleep(timeout) when IDLE is unavailable, so callers can
+    use it as a drop-in replacement for the fixed poll sleep.
+    """
+    client = _get_client()
+    if client is None:
+        time.sleep(timeout)
+        return False
+    try:
+        client.idle()
+        try:
+            responses = client.idle_check(timeout=timeout)
+        finally:
+            client.idle_done()
+        return any(
+            len(r) > 1 and r[1] == b'EXISTS' for r in (responses or [])
+        )
+    except Exception:
+        # dead connection (server dropped the IDLE, network blip): rebuild
+        # next call and keep the polling cadence meanwhile
+        log.warning("imap_idle_wait_failed", exc_info=True)
+        _drop_client()
+        time.sleep(min(timeout, 5.0))
+        return False
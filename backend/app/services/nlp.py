@@ -1,12 +1,36 @@
+import re
 from textblob import TextBlob
 from typing import Tuple, List
 
+try:  # lexicon scorer; no per-call POS tagging like TextBlob's analyzer
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer  # type: ignore
+    _SIA = SentimentIntensityAnalyzer()  # loads its lexicon once at import
+except ImportError:  # pragma: no cover
+    _SIA = None
+
 NEGATIVE_HINTS = ['angry','frustrated','upset','bad','worst','unhappy','disappointed']
 PRIORITY_HINTS = ['immediately','critical','cannot access','urgent','down','failure']
 
+# Precompiled once: extract_info runs on every ingest/detail view, and
+# re.compile inside the call dominated its cost. The action and negative-hint
+# alternations turn N findall passes over the body into one each.
+PHONE_RE = re.compile(r"\+?\d[\d\-\s]{7,}\d")
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+TOKEN_RE = re.compile(r"[A-Za-z]{4,18}")
+# lookahead so overlapping verbs still both match (e.g. "deactivate" also
+# contains "activate"), mirroring the old one-findall-per-pattern behavior
+ACTION_RE = re.compile(r"(?=(reset|refund|cancel|update|upgrade|unlock|activate|deactivate|remove|add))")
+NEGATIVE_RE = re.compile("|".join(NEGATIVE_HINTS))
+STOP_WORDS = frozenset(["this","that","have","with","from","subject","please","thanks","thank","regarding","about","their","there","would","could","should","hello","hi","team","your","issue","request","problem"])
+
 
 def analyze_sentiment(text: str) -> str:
-    polarity = TextBlob(text).sentiment.polarity
+    # VADER's compound score uses the same ±0.1 cutoffs as the old TextBlob
+    # polarity; TextBlob remains the fallback when vaderSentiment is absent.
+    if _SIA is not None:
+        polarity = _SIA.polarity_scores(text)['compound']
+    else:
+        polarity = TextBlob(text).sentiment.polarity
     if polarity > 0.1:
         return 'Positive'
     if polarity < -0.1:
@@ -24,23 +48,20 @@ def determine_priority(text: str) -> str:
 
 
 def extract_info(text: str):
-    import re
     lowered = text.lower()
-    phones = re.findall(r"\+?\d[\d\-\s]{7,}\d", text)
-    emails = re.findall(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}", text)
+    phones = PHONE_RE.findall(text)
+    emails = EMAIL_RE.findall(text)
     # simple keyword extraction: take unique nouns-ish tokens length 4..18 excluding stop words
-    tokens = re.findall(r"[A-Za-z]{4,18}", lowered)
-    stop = set(["this","that","have","with","from","subject","please","thanks","thank","regarding","about","their","there","would","could","should","hello","hi","team","your","issue","request","problem"])
     keywords: List[str] = []
-    for t in tokens:
-        if t in stop: continue
-        if t in keywords: continue
-        if any(c.isdigit() for c in t): continue
+    seen = set()  # O(1) dedup; 'in keywords' re-scanned the list per token
+    for t in TOKEN_RE.findall(lowered):
+        if t in STOP_WORDS or t in seen: continue
+        seen.add(t)
         keywords.append(t)
         if len(keywords) >= 8: break
     # requested actions: look for imperative verbs (very naive)
-    action_patterns = [r"reset", r"refund", r"cancel", r"update", r"upgrade", r"unlock", r"activate", r"deactivate", r"remove", r"add"]
-    requested_actions = sorted({m for p in action_patterns for m in re.findall(p, lowered)})
+    requested_actions = sorted(set(ACTION_RE.findall(lowered)))
     # sentiment indicator terms actually present
-    sentiment_terms = [w for w in NEGATIVE_HINTS if w in lowered]
+    negatives_found = set(NEGATIVE_RE.findall(lowered))
+    sentiment_terms = [w for w in NEGATIVE_HINTS if w in negatives_found]
     return phones, emails, keywords, requested_actions, sentiment_terms
@@ -0,0 +1,161 @@
+"""Memoized wrappers around the NLP entry points.
+
+The email handlers re-run sentiment / priority / extraction over the same
+body text on every detail view and regenerate call. These wrappers key the
+results on a digest of the body so repeat hits are a hash + dict lookup
+instead of an O(len(body)) regex pass. An optional Redis backend (REDIS_URL)
+shares the cache across workers; results serialize via orjson when present.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import threading
+from asyncio import get_running_loop
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from .nlp import analyze_sentiment, determine_priority, extract_info
+
+try:  # optional fast serializer (already used by core.logging)
+    import orjson  # type: ignore
+
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+    _loads = json.loads
+
+try:  # optional cross-worker backend (ships with requirements-ml)
+    import redis  # type: ignore
+except ImportError:  # pragma: no cover
+    redis = None  # type: ignore
+
+CACHE_MAX_ENTRIES = 8192
+REDIS_TTL_S = 3600
+
+
+class _Lru:
+    """Small thread-safe LRU; values are cheap tuples/strings."""
+
+    def __init__(self, maxsize: int = CACHE_MAX_ENTRIES):
+        self._data: "OrderedDict[bytes, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = maxsize
+
+    def get(self, key: bytes):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+                return self._data[key]
+            except KeyError:
+                return None
+
+    def put(self, key: bytes, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+_local = _Lru()
+_redis_client = None
+_redis_checked = False
+
+
+def _get_redis():
+    global _redis_client, _redis_checked
+    if _redis_checked:
+        return _redis_client
+    _redis_checked = True
+    url = os.getenv('REDIS_URL')
+    if url and redis is not None:
+        try:
+            _redis_client = redis.Redis.from_url(url, socket_timeout=1)
+            _redis_client.ping()
+        except Exception as e:
+            logging.getLogger(__name__).warning("nlp_cache_redis_unavailable", exc_info=e)
+            _redis_client = None
+    return _redis_client
+
+
+def _digest(prefix: bytes, body: str) -> bytes:
+    return prefix + hashlib.blake2b(body.encode('utf-8', 'ignore'), digest_size=8).digest()
+
+
+def _cached(prefix: bytes, body: str, compute, decode=None):
+    key = _digest(prefix, body)
+    val = _local.get(key)
+    if val is not None:
+        return val
+    r = _get_redis()
+    if r is not None:
+        try:
+            raw = r.get(key)
+            if raw:
+                val = _loads(raw)
+                if decode:
+                    val = decode(val)
+                _local.put(key, val)
+                return val
+        except Exception:
+            pass
+    val = compute(body)
+    _local.put(key, val)
+    if r is not None:
+        try:
+            r.set(key, _dumps(val), ex=REDIS_TTL_S)
+        except Exception:
+            pass
+    return val
+
+
+def cached_analyze(body: str) -> str:
+    return _cached(b's', body, analyze_sentiment)
+
+
+def cached_determine(body: str) -> str:
+    return _cached(b'p', body, determine_priority)
+
+
+def cached_extract(body: str):
+    # tuple of (phones, alt_emails, keywords, requested_actions, sentiment_terms)
+    return _cached(b'x', body, extract_info, decode=tuple)
+
+
+# Shared bounded pool for NLP fan-out. One small fixed-size executor (instead
+# of the per-request Starlette pool) keeps CPU use predictable and avoids
+# oversubscription when RAG embeddings run on the same cores.
+NLP_WORKERS = min(4, os.cpu_count() or 1)
+NLP_EXECUTOR = ThreadPoolExecutor(max_workers=NLP_WORKERS, thread_name_prefix='nlp')
+
+
+def score_email(body: str):
+    """Run sentiment, priority and extraction concurrently on the shared pool.
+
+    Returns (sentiment, priority, extracted) — the three passes are
+    independent, so a cold-cache call costs one pass of wall clock, not three.
+    """
+    f_sent = NLP_EXECUTOR.submit(cached_analyze, body)
+    f_pri = NLP_EXECUTOR.submit(cached_determine, body)
+    f_ext = NLP_EXECUTOR.submit(cached_extract, body)
+    return f_sent.result(), f_pri.result(), f_ext.result()
+
+
+async def cached_analyze_async(body: str) -> str:
+    return await get_running_loop().run_in_executor(NLP_EXECUTOR, cached_analyze, body)
+
+
+async def cached_determine_async(body: str) -> str:
+    return await get_running_loop().run_in_executor(NLP_EXECUTOR, cached_determine, body)
+
+
+async def cached_extract_async(body: str):
+    return await get_running_loop().run_in_executor(NLP_EXECUTOR, cached_extract, body)
@@ -1,28 +1,50 @@
-import heapq
-from dataclasses import dataclass, field
-from typing import Any, List, Iterator
+import itertools
+import threading
+from collections import deque
+from typing import Any, Iterator, Tuple
 
-@dataclass(order=True)
-class PrioritizedEmail:
-    priority_rank: int
-    email_id: int = field(compare=False)
-    data: Any = field(compare=False, default=None)
 
 class EmailPriorityQueue:
+    """Two-level bucket queue: urgent emails drain before everything else.
+
+    There are only two ranks (Urgent and not), so a heap was overkill — two
+    deques give O(1) push/pop with no per-enqueue wrapper allocation, and
+    iteration is a chain instead of an O(N log N) sort. A lock guards both
+    deques because producers (API/fetcher) and the worker run on different
+    threads.
+    """
+
     def __init__(self):
-        self._heap: List[PrioritizedEmail] = []
+        self._urgent: deque[Tuple[int, Any]] = deque()
+        self._normal: deque[Tuple[int, Any]] = deque()
+        # ids currently enqueued; retries can push the same email twice, and
+        # without this each duplicate costs the worker a wasted DB round-trip
+        self._present: set[int] = set()
+        self._lock = threading.Lock()
 
     def push(self, email_id: int, urgency: str, data=None):
-        rank = 0 if urgency == 'Urgent' else 1
-        heapq.heappush(self._heap, PrioritizedEmail(rank, email_id, data))
+        bucket = self._urgent if urgency == 'Urgent' else self._normal
+        with self._lock:
+            if email_id in self._present:
+                return
+            self._present.add(email_id)
+            bucket.append((email_id, data))
 
-    def pop(self) -> PrioritizedEmail | None:
-        if not self._heap:
-            return None
-        return heapq.heappop(self._heap)
+    def pop(self) -> Tuple[int, Any] | None:
+        with self._lock:
+            if self._urgent:
+                item = self._urgent.popleft()
+            elif self._normal:
+                item = self._normal.popleft()
+            else:
+                return None
+            self._present.discard(item[0])
+            return item
 
     def __len__(self):
-        return len(self._heap)
+        with self._lock:
+            return len(self._urgent) + len(self._normal)
 
-    def __iter__(self) -> Iterator[PrioritizedEmail]:
-        return (item for item in sorted(self._heap))
+    def __iter__(self) -> Iterator[Tuple[int, Any]]:
+        with self._lock:
+            return iter(list(itertools.chain(self._urgent, self._normal)))
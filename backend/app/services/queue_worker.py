@@ -1,115 +1,179 @@
+import json
 import threading
 import time
 import logging
 import os
+
+try:
+    import orjson  # type: ignore
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # pragma: no cover
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(',', ':'))
+
 from .priority_queue import EmailPriorityQueue
 from sqlalchemy.orm import Session
 from ..db.database import SessionLocal
-from .email_service import get_email, save_auto_response
-from .nlp import analyze_sentiment, determine_priority, extract_info
-from .auto_responder import generate_response
+from .email_service import save_auto_response
+from ..models.email_model import Email
+from .auto_responder import generate_response, generate_responses_bulk, GENERATE_CONCURRENCY
 from ..core.events import broadcaster
 
 _queue = EmailPriorityQueue()
 _running = False
 _thread: threading.Thread | None = None
+# wakes the idle worker the moment something is enqueued instead of waiting
+# out the poll interval; the timed wait below stays as a safety re-check
+_cv = threading.Condition()
 
 SLEEP_INTERVAL = 2  # seconds idle wait
 MAX_ATTEMPTS_PER_EMAIL = 3
+GEN_BATCH_MAX = GENERATE_CONCURRENCY  # drain at most one executor's worth per tick
 _attempt_counts: dict[int, int] = {}
 
 
 def enqueue_email(email_id: int, priority: str):
     _queue.push(email_id, priority)
+    with _cv:
+        _cv.notify()
+
+
+def enqueue_email_batch(items: list[tuple[int, str]]):
+    """Enqueue a fetch cycle's worth of (email_id, priority) in one go.
+
+    Queued together, the whole cycle lands in the worker's next drain and is
+    generated as one bulk call instead of trickling in across ticks.
+    """
+    for email_id, priority in items:
+        _queue.push(email_id, priority)
+    if items:
+        with _cv:
+            _cv.notify()
+
+
+def _register_failure(db: Session, email, email_id: int) -> bool:
+    """Count a failed/empty generation for this email.
+
+    After MAX_ATTEMPTS_PER_EMAIL, saves a minimal local reply and stops
+    re-queueing; otherwise re-enqueues. Returns True if re-enqueued.
+    """
+    attempts = _attempt_counts.get(email_id, 0) + 1
+    _attempt_counts[email_id] = attempts
+    if attempts >= MAX_ATTEMPTS_PER_EMAIL:
+        local_reply = _build_local_fallback(email.subject, email.body)
+        if local_reply:
+            save_auto_response(db, email, local_reply)
+            try:
+                broadcaster.publish("email_updated", _dumps({'id': email.id, 'status': 'responded'}))
+            except Exception:
+                pass
+        # reset counter after fallback
+        _attempt_counts.pop(email_id, None)
+        return False
+    try:
+        _queue.push(email_id, email.priority or 'Not urgent')
+    except Exception:
+        pass
+    return True
 
 
 def _worker_loop():
     global _running
-    while _running:
-        item = _queue.pop()
-        if not item:
-            time.sleep(SLEEP_INTERVAL)
-            continue
-        db: Session = SessionLocal()
-        try:
-            email = get_email(db, item.email_id)
-            if not email:
-                continue
-            # if already has auto_response skip
-            if email.auto_response:
-                continue
+    # One session for the worker's lifetime: opening and closing per batch
+    # re-ran connection checkout and session setup for every tick.
+    # expire_on_commit=False keeps batch objects usable after the commit
+    # without a refresh SELECT each.
+    db: Session = SessionLocal(expire_on_commit=False)
+    try:
+        while _running:
+            _worker_tick(db)
+    finally:
+        db.close()
+
+
+def _worker_tick(db: Session):
+    item = _queue.pop()
+    if not item:
+        with _cv:
+            _cv.wait(timeout=SLEEP_INTERVAL)
+        return
+    # Drain whatever else is ready so a fetched batch of N emails costs
+    # ~one LLM round-trip of wall clock instead of N serial calls.
+    batch = [item]
+    while len(batch) < GEN_BATCH_MAX:
+        nxt = _queue.pop()
+        if not nxt:
+            break
+        batch.append(nxt)
+    try:
+        # One IN query loads the whole drain instead of a SELECT per item;
+        # vanished rows and already-answered emails drop out here.
+        ids = [email_id for email_id, _data in batch]
+        by_id = {
+            e.id: e
+            for e in db.query(Email).filter(Email.id.in_(ids)).all()
+        }
+        pending = [
+            (email_id, by_id[email_id])
+            for email_id in ids
+            if email_id in by_id and not by_id[email_id].auto_response
+        ]
+        if pending:
             rag_results = []  # could integrate RAG engine via singleton import
-            try:
-                auto_resp = generate_response(email.subject, email.body, email.sentiment, email.priority, rag_results)
-            except Exception as e:
-                # On transient/provider errors (e.g., 429 cooldown), re-enqueue and continue
-                attempts = _attempt_counts.get(item.email_id, 0) + 1
-                _attempt_counts[item.email_id] = attempts
-                logging.getLogger(__name__).warning(
-                    "queue_worker_generate_failed",
-                    exc_info=e,
-                    extra={
-                        'email_id': item.email_id,
-                        'attempts': attempts,
-                    }
-                )
-                if attempts >= MAX_ATTEMPTS_PER_EMAIL:
-                    # Give up on provider for this email; save a minimal local reply and stop re-queueing
-                    local_reply = _build_local_fallback(email.subject, email.body)
-                    if local_reply:
-                        save_auto_response(db, email, local_reply)
-                        try:
-                            broadcaster.publish("email_updated", f"{{\"id\":{email.id},\"status\":\"responded\"}}")
-                        except Exception:
-                            pass
-                    # reset counter after fallback
-                    _attempt_counts.pop(item.email_id, None)
-                    continue
-                try:
-                    # small pause to avoid tight-loop on repeated errors
-                    time.sleep(3)
-                    _queue.push(item.email_id, email.priority or 'Not urgent')
-                except Exception:
-                    pass
-                continue
-            # Save only if we have a non-empty response
-            if auto_resp and auto_resp.strip():
-                save_auto_response(db, email, auto_resp)
-                try:
-                    # broadcast update (minimal JSON)
-                    broadcaster.publish("email_updated", f"{{\"id\":{email.id},\"status\":\"responded\"}}")
-                except Exception:
-                    pass
-                # success -> clear attempts
-                _attempt_counts.pop(item.email_id, None)
-            else:
-                # Treat empty as failure and re-enqueue with attempt tracking
-                attempts = _attempt_counts.get(item.email_id, 0) + 1
-                _attempt_counts[item.email_id] = attempts
-                logging.getLogger(__name__).warning(
-                    "queue_worker_empty_response",
-                    extra={
-                        'email_id': item.email_id,
-                        'attempts': attempts,
-                    }
-                )
-                if attempts >= MAX_ATTEMPTS_PER_EMAIL:
-                    local_reply = _build_local_fallback(email.subject, email.body)
-                    if local_reply:
-                        save_auto_response(db, email, local_reply)
-                        try:
-                            broadcaster.publish("email_updated", f"{{\"id\":{email.id},\"status\":\"responded\"}}")
-                        except Exception:
-                            pass
-                    _attempt_counts.pop(item.email_id, None)
+            jobs = [(e.subject, e.body, e.sentiment, e.priority, rag_results) for _, e in pending]
+            results = generate_responses_bulk(jobs)
+            requeued = False
+            responded: list[int] = []
+            for (email_id, email), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    # Transient/provider errors (e.g., 429 cooldown) retry later
+                    logging.getLogger(__name__).warning(
+                        "queue_worker_generate_failed",
+                        exc_info=result,
+                        extra={
+                            'email_id': email_id,
+                            'attempts': _attempt_counts.get(email_id, 0) + 1,
+                        }
+                    )
+                    requeued = _register_failure(db, email, email_id) or requeued
+                elif result and result.strip():
+                    # assign only; the whole batch commits once below
+                    email.auto_response = result
+                    responded.append(email_id)
+                    # success -> clear attempts
+                    _attempt_counts.pop(email_id, None)
                 else:
+                    # Treat empty as failure and re-enqueue with attempt tracking
+                    logging.getLogger(__name__).warning(
+                        "queue_worker_empty_response",
+                        extra={
+                            'email_id': email_id,
+                            'attempts': _attempt_counts.get(email_id, 0) + 1,
+                        }
+                    )
+                    requeued = _register_failure(db, email, email_id) or requeued
+            if responded:
+                db.commit()
+                for email_id in responded:  # broadcast only after the commit lands
                     try:
-                        time.sleep(2)
-                        _queue.push(item.email_id, email.priority or 'Not urgent')
+                        broadcaster.publish("email_updated", _dumps({'id': email_id, 'status': 'responded'}))
                     except Exception:
                         pass
-        finally:
-            db.close()
+            if requeued:
+                # small pause to avoid tight-looping on repeated errors
+                time.sleep(3)
+    except Exception:
+        logging.getLogger(__name__).exception("queue_worker_tick_error")
+        try:
+            db.rollback()
+        except Exception:
+            pass
+        time.sleep(SLEEP_INTERVAL)
+    finally:
+        # drop batch objects so the long-lived identity map doesn't grow
+        db.expunge_all()
 
 
 def start_queue_worker():
@@ -124,6 +188,8 @@ def start_queue_worker():
 def stop_queue_worker():
     global _running
     _running = False
+    with _cv:  # unblock a worker parked in the idle wait so it exits promptly
+        _cv.notify_all()
 
 
 def _build_local_fallback(subject: str, body: str) -> str:
@@ -11,12 +11,22 @@ Each provider returns a list of dicts with keys: sender, subject, body, received
 from __future__ import annotations
 from datetime import datetime, timezone
 from typing import List, Dict
+import email
+import heapq
+import html as _html
+import imaplib
 import os
 import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from email.parser import BytesParser
+from functools import partial
 import socket
 
-@dataclass
+@dataclass(slots=True)
 class GmailDiag:
     last_error: str | None = None
     last_login_ok: bool | None = None
@@ -26,10 +36,141 @@ class GmailDiag:
 
 gmail_diag = GmailDiag()
 
-from .email_fetcher import fetch_emails as generic_imap_fetch
+from .email_fetcher import (
+    fetch_emails as generic_imap_fetch,
+    checkout_imap,
+    release_imap,
+    discard_imap,
+    decode_subject,
+    decode_text,
+    MAX_BODY_BYTES,
+)
 
 def _now_iso():
-    return datetime.now(timezone.utc).isoformat()
+    # strftime over gmtime skips tz-aware datetime construction; only used
+    # as the received_at fallback when a message carries no Date header
+    return time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+
+
+# cap per UID FETCH so one request never exceeds server limits; 100 UIDs of
+# metadata is well under every major provider's max command length
+_FETCH_CHUNK = 100
+# batched FETCH responses arrive in server order, so each message's UID comes
+# from the response metadata rather than the loop position
+_UID_RE = re.compile(rb'UID (\d+)')
+
+# Highest UID already fetched per (host, user, mailbox, uidvalidity): warm
+# polls search only past it, so most cycles transfer 0-1 messages instead of
+# re-fetching the newest `limit`. Keying on UIDVALIDITY makes a mailbox reset
+# fall back to a full search instead of missing renumbered messages.
+_last_uid: dict[tuple, int] = {}
+
+# HTML-stripping patterns, compiled once: the strip path runs up to four subs
+# per HTML email, and going through re's cache re-parses flags and hashes the
+# pattern string every call
+_RE_BR = re.compile(r'<\s*br\s*/?>', re.I)
+_RE_BLOCK = re.compile(r'</(p|div|tr|table|li|h[1-6])\s*>', re.I)
+_RE_TAG = re.compile(r'<[^>]+>')
+_RE_WS = re.compile(r'\s+')
+_RE_TAGS_FIND = re.compile(r'<[^>]{1,200}>')
+# already lowercase; matched against one lowercased copy of the body
+_HTML_MARKERS = ('<html','<body','<table','</tr','</td','<div','<!doctype','<span','<p','style=','class=')
+
+try:  # C single-pass HTML->text (requirements-base); regex chain is the fallback
+    from selectolax.parser import HTMLParser as _HTMLParser  # type: ignore
+except ImportError:  # pragma: no cover
+    _HTMLParser = None
+
+
+def _strip_html(txt: str) -> str:
+    if _HTMLParser is not None:
+        # one parse instead of four regex passes + unescape; also handles
+        # entities, comments and script/style content correctly
+        try:
+            return _RE_WS.sub(' ', _HTMLParser(txt).text(separator=' ')).strip()
+        except Exception:
+            pass
+    txt = _RE_BR.sub('\n', txt)
+    txt = _RE_BLOCK.sub('\n', txt)
+    txt = _RE_TAG.sub(' ', txt)
+    return _html.unescape(_RE_WS.sub(' ', txt)).strip()
+
+
+def _parse_gmail_message(raw: bytes, uid: str, now_iso: str | None = None) -> Dict | None:
+    """Parse one raw RFC822 message into the provider dict shape."""
+    msg = email.message_from_bytes(raw)
+    subject = decode_subject(msg.get('Subject'))
+    sender = msg.get('From') or ''
+    date_hdr = msg.get('Date') or now_iso or _now_iso()
+    body = ''
+    html_candidate = ''
+    if msg.is_multipart():
+        # collect-then-join instead of += so many-part mails stay linear,
+        # with the same byte budget the generic fetcher applies
+        chunks = []
+        budget = MAX_BODY_BYTES
+        for part in msg.walk():
+            # cheap maintype gate first: images/base64 attachments and
+            # multipart containers drop out before any header assembly
+            if part.get_content_maintype() != 'text':
+                continue
+            ctype = part.get_content_type()
+            disp = str(part.get('Content-Disposition'))
+            if 'attachment' in disp:
+                continue
+            if ctype == 'text/plain':
+                try:
+                    payload = part.get_payload(decode=True)
+                except Exception:
+                    continue
+                if not payload:
+                    continue
+                if len(payload) > budget:
+                    payload = payload[:budget]
+                budget -= len(payload)
+                chunks.append(decode_text(payload, part.get_content_charset()))
+                if budget <= 0:
+                    break  # enough text; stop walking attachment parts
+            elif ctype == 'text/html' and not chunks:
+                # keep as fallback only if no plain text collected; capped so
+                # a multi-MB HTML part can't balloon the strip pass
+                try:
+                    html_candidate = decode_text(
+                        (part.get_payload(decode=True) or b'')[:MAX_BODY_BYTES],
+                        part.get_content_charset())
+                except Exception:
+                    pass
+        body = ''.join(chunks)
+    else:
+        payload = msg.get_payload(decode=True)
+        if payload:
+            try:
+                body = decode_text(payload[:MAX_BODY_BYTES], msg.get_content_charset())
+            except Exception:
+                body = ''
+    # If no text/plain but we have html part -> strip and use
+    if not body and html_candidate:
+        body = _strip_html(html_candidate)
+    # Some senders wrongly embed full HTML inside text/plain; broaden detection.
+    # Bodies with under 4 '<' are prose with stray angle brackets — skip the
+    # tag scan entirely for them.
+    if body and '>' in body and body.count('<') >= 4:
+        body_lc = body.lower()  # lowercase once, not once per marker
+        html_markers = sum(1 for mk in _HTML_MARKERS if mk in body_lc)
+        tag_matches = _RE_TAGS_FIND.findall(body)
+        tag_ratio = len(''.join(tag_matches)) / max(1, len(body))
+        # Strip if clear HTML structure OR density high
+        if html_markers >= 2 or len(tag_matches) > 8 or tag_ratio > 0.04:
+            txt = _strip_html(body)
+            if txt and len(txt) > 5:
+                body = txt
+    return {
+        'sender': sender,
+        'subject': subject,
+        'body': body,
+        'received_at': date_hdr,
+        'external_id': uid,
+    }
 
 
 def fetch_from_imap(limit: int) -> List[Dict]:
@@ -43,8 +184,6 @@ def fetch_from_imap(limit: int) -> List[Dict]:
 
 def fetch_from_gmail(limit: int) -> List[Dict]:  # Gmail over IMAP with optional label search (uses UID for dedupe)
     # Gmail IMAP host is fixed; label search uses X-GM-RAW if provided.
-    import imaplib, email
-    from email.header import decode_header
     if os.getenv('GMAIL_DEBUG') == '1':  # protocol-level debug
         try:
             imaplib.Debug = 4
@@ -60,107 +199,112 @@ def fetch_from_gmail(limit: int) -> List[Dict]:  # Gmail over IMAP with optional
         return []
     host = 'imap.gmail.com'
     mails: List[Dict] = []
+    imap = None
     try:
-        # Connection-specific timeout (avoid changing global default which broke other sockets/SSE)
+        # Connection-specific timeouts (avoid changing global default which
+        # broke other sockets/SSE). Connect gets a short budget — a healthy
+        # handshake is fast and a dead host should fail quickly — while reads
+        # get a longer one so a large FETCH isn't cut off mid-literal.
+        # GMAIL_TIMEOUT remains the fallback for both.
         try:
-            to = float(os.getenv('GMAIL_TIMEOUT', '8'))
+            base_to = float(os.getenv('GMAIL_TIMEOUT', '8'))
         except Exception:
-            to = 8.0
-        from datetime import datetime, timezone
-        gmail_diag.last_ts = datetime.now(timezone.utc).isoformat()
-        # imaplib.IMAP4_SSL in Py3.12 accepts 'timeout' param; fallback if not
+            base_to = 8.0
         try:
-            imap = imaplib.IMAP4_SSL(host, timeout=to)
-        except TypeError:  # older python
-            imap = imaplib.IMAP4_SSL(host)
+            connect_to = float(os.getenv('GMAIL_CONNECT_TIMEOUT', str(min(base_to, 3.0))))
+        except Exception:
+            connect_to = 3.0
+        try:
+            read_to = float(os.getenv('GMAIL_READ_TIMEOUT', str(max(base_to, 15.0))))
+        except Exception:
+            read_to = 15.0
+        gmail_diag.last_ts = datetime.now(timezone.utc).isoformat()
+
+        def _connect():
+            # imaplib.IMAP4_SSL in Py3.12 accepts 'timeout' param; fallback if not
             try:
-                imap.sock.settimeout(to)
+                conn = imaplib.IMAP4_SSL(host, timeout=connect_to)
+            except TypeError:  # older python
+                conn = imaplib.IMAP4_SSL(host)
+                try:
+                    conn.sock.settimeout(connect_to)
+                except Exception:
+                    pass
+            _enable_keepalive(conn.sock)
+            conn.login(user, pwd)
+            try:  # past the handshake: switch the socket to the read budget
+                conn.sock.settimeout(read_to)
             except Exception:
                 pass
-        imap.login(user, pwd)
+            return conn
+
+        # pooled session: skips TLS handshake + LOGIN on every poll cycle
+        imap = checkout_imap(host, user, _connect)
         gmail_diag.last_login_ok = True
         imap.select(label or 'INBOX')
-        status, data = imap.uid('search', None, 'ALL')
+        try:
+            uidvalidity = (imap.response('UIDVALIDITY')[1] or [b''])[0]
+        except Exception:
+            uidvalidity = b''
+        uid_key = (host, user, label or 'INBOX', uidvalidity)
+        since = _last_uid.get(uid_key, 0)
+        if since:
+            # only UIDs past the high-water mark; servers still echo the
+            # newest message for 'n:*' even when n exceeds it, hence the
+            # explicit filter below
+            status, data = imap.uid('search', None, f'UID {since + 1}:*'.encode())
+        else:
+            status, data = imap.uid('search', None, 'ALL')
         if status != 'OK':
             gmail_diag.last_error = f"search_failed_status_{status}"
+            release_imap(host, user, imap)
             return []
         uids = data[0].split()[-limit:]
-        for uid in reversed(uids):  # iterate oldest->newest among slice
-            res, msg_data = imap.uid('fetch', uid, '(RFC822)')
+        if since:
+            uids = [u for u in uids if int(u) > since]
+        max_seen = since
+        now_iso = _now_iso()  # one fallback timestamp per batch, not per message
+        # One UID FETCH per chunk instead of one per message: N round-trips
+        # collapse to ceil(N/_FETCH_CHUNK), which is what dominates wall time
+        # on a high-RTT link.
+        for i in range(0, len(uids), _FETCH_CHUNK):
+            chunk = uids[i:i + _FETCH_CHUNK]
+            # BODY.PEEK[] is byte-identical to RFC822 but skips the implicit
+            # \Seen store; narrower section fetches (HEADER.FIELDS + TEXT)
+            # don't work here because the multipart walk needs the full MIME
+            # tree, mirroring the generic fetcher in email_fetcher.
+            try:
+                res, msg_data = imap.uid('fetch', b','.join(chunk), '(BODY.PEEK[])')
+            except Exception:
+                # mid-batch timeout: keep the chunks already parsed instead of
+                # discarding the whole poll; the dead session leaves the pool
+                gmail_diag.last_error = "fetch_timeout_partial"
+                discard_imap(imap)
+                imap = None
+                break
             if res != 'OK':
                 continue
             for response_part in msg_data:
-                if isinstance(response_part, tuple):
-                    msg = email.message_from_bytes(response_part[1])
-                    subject, encoding = decode_header(msg.get('Subject') or '')[0]
-                    if isinstance(subject, bytes):
-                        subject = subject.decode(encoding or 'utf-8', errors='ignore')
-                    sender = msg.get('From') or ''
-                    date_hdr = msg.get('Date') or _now_iso()
-                    body = ''
-                    html_candidate = ''
-                    if msg.is_multipart():
-                        for part in msg.walk():
-                            ctype = part.get_content_type()
-                            disp = str(part.get('Content-Disposition'))
-                            if ctype == 'text/plain' and 'attachment' not in disp:
-                                charset = part.get_content_charset() or 'utf-8'
-                                try:
-                                    body += part.get_payload(decode=True).decode(charset, errors='ignore')
-                                except Exception:
-                                    pass
-                            elif ctype == 'text/html' and 'attachment' not in disp and not body:
-                                # keep as fallback only if no plain text collected
-                                try:
-                                    html_candidate = part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8', errors='ignore')
-                                except Exception:
-                                    pass
-                    else:
-                        charset = msg.get_content_charset() or 'utf-8'
-                        payload = msg.get_payload(decode=True)
-                        if payload:
-                            try:
-                                body = payload.decode(charset, errors='ignore')
-                            except Exception:
-                                body = ''
-                    import re, html as _html
-                    # If no text/plain but we have html part -> strip and use
-                    if not body and html_candidate:
-                        txt = html_candidate
-                        txt = re.sub(r'<\s*br\s*/?>', '\n', txt, flags=re.I)
-                        txt = re.sub(r'</(p|div|tr|table|li|h[1-6])\s*>', '\n', txt, flags=re.I)
-                        txt = re.sub(r'<[^>]+>', ' ', txt)
-                        txt = _html.unescape(re.sub(r'\s+', ' ', txt)).strip()
-                        body = txt
-                    # Some senders wrongly embed full HTML inside text/plain; broaden detection
-                    if body and '<' in body and '>' in body:
-                        tag_matches = re.findall(r'<[^>]{1,200}>', body)
-                        if tag_matches:
-                            tag_ratio = len(''.join(tag_matches)) / max(1, len(body))
-                            html_markers = 0
-                            for mk in ('<html','<body','<table','</tr','</td','<div','<!DOCTYPE','<span','<p','style=','class='):
-                                if mk.lower() in body.lower():
-                                    html_markers += 1
-                            # Strip if clear HTML structure OR density high
-                            if html_markers >= 2 or len(tag_matches) > 8 or tag_ratio > 0.04:
-                                txt = body
-                                txt = re.sub(r'<\s*br\s*/?>', '\n', txt, flags=re.I)
-                                txt = re.sub(r'</(p|div|tr|table|li|h[1-6])\s*>', '\n', txt, flags=re.I)
-                                txt = re.sub(r'<[^>]+>', ' ', txt)
-                                txt = _html.unescape(re.sub(r'\s+', ' ', txt)).strip()
-                                if txt and len(txt) > 5:
-                                    body = txt
-                    mails.append({
-                        'sender': sender,
-                        'subject': subject,
-                        'body': body,
-                        'received_at': date_hdr,
-                        'external_id': uid.decode(errors='ignore') if isinstance(uid, bytes) else str(uid)
-                    })
-        imap.logout()
+                if not isinstance(response_part, tuple):
+                    continue  # skip the b')' literal terminators
+                m = _UID_RE.search(response_part[0] or b'')
+                uid = m.group(1).decode() if m else ''
+                try:
+                    mail = _parse_gmail_message(response_part[1], uid, now_iso)
+                except Exception:
+                    continue  # one malformed message shouldn't sink the batch
+                if mail:
+                    mails.append(mail)
+                    if uid:  # advance only over messages actually delivered
+                        max_seen = max(max_seen, int(uid))
+        if max_seen > since:
+            _last_uid[uid_key] = max_seen
+        mails.reverse()  # newest first, matching the old per-UID iteration
+        if imap is not None:
+            release_imap(host, user, imap)
+            gmail_diag.last_error = None
         gmail_diag.last_fetch_count = len(mails)
         gmail_diag.last_label = label or 'INBOX'
-        gmail_diag.last_error = None
     except Exception as e:
         logging.getLogger(__name__).warning(
             "gmail_fetch_error",
@@ -169,10 +313,68 @@ def fetch_from_gmail(limit: int) -> List[Dict]:  # Gmail over IMAP with optional
         )
         gmail_diag.last_error = type(e).__name__ + ":" + str(e)
         gmail_diag.last_login_ok = False
+        if imap is not None:  # broken session must not go back in the pool
+            discard_imap(imap)
         return []
     return mails
 
 
+# Pooled Gmail IMAP session for ping: a fresh TLS handshake costs ~300ms per
+# probe, so keep one logged-in connection alive and just send NOOP over it.
+# Guarded by a lock since pings can race the background fetcher.
+_gmail_conn = None
+_gmail_conn_lock = threading.Lock()
+
+
+def _enable_keepalive(sock):  # pragma: no cover - socket opt availability varies
+    """TCP keepalive so NAT boxes don't silently drop the idle session."""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+    except OSError:
+        pass
+
+
+def _gmail_connect():
+    """Open and log in a fresh Gmail IMAP session (None if creds missing)."""
+    user = os.getenv('GMAIL_USER') or os.getenv('EMAIL_IMAP_USER')
+    pwd = os.getenv('GMAIL_APP_PASSWORD') or os.getenv('EMAIL_IMAP_PASSWORD')
+    if not (user and pwd):
+        return None
+    try:
+        to = float(os.getenv('GMAIL_TIMEOUT', '8'))
+    except ValueError:
+        to = 8.0
+    conn = imaplib.IMAP4_SSL('imap.gmail.com', timeout=to)
+    _enable_keepalive(conn.sock)
+    conn.login(user, pwd)
+    return conn
+
+
+def gmail_ping() -> Dict:
+    """NOOP over the pooled session; reconnects once if the socket went stale."""
+    global _gmail_conn
+    with _gmail_conn_lock:
+        for attempt in (0, 1):
+            try:
+                if _gmail_conn is None:
+                    _gmail_conn = _gmail_connect()
+                if _gmail_conn is None:
+                    return {"reachable": False, "error": "missing_credentials"}
+                start = time.perf_counter()
+                _gmail_conn.noop()
+                return {"reachable": True, "ms": round((time.perf_counter() - start) * 1000, 1)}
+            except Exception as e:
+                try:
+                    _gmail_conn.shutdown()
+                except Exception:
+                    pass
+                _gmail_conn = None
+                if attempt:
+                    return {"reachable": False, "error": type(e).__name__ + ":" + str(e)}
+
+
 def fetch_from_outlook(limit: int) -> List[Dict]:
     """Fetch emails via Microsoft Graph.
     Requirements (not enforced here): OUTLOOK_TENANT_ID, OUTLOOK_CLIENT_ID, OUTLOOK_CLIENT_SECRET, OUTLOOK_USER_ID.
@@ -185,32 +387,73 @@ def fetch_from_outlook(limit: int) -> List[Dict]:
     return []
 
 
+def _parse_eml(full_path: str, now_iso: str | None = None) -> Dict:
+    with open(full_path, 'rb') as fh:
+        # feed the parser from the file instead of read()-ing the whole
+        # message into one bytes object first
+        msg = BytesParser().parse(fh)
+    sender = msg.get('From') or ''
+    subject = msg.get('Subject') or ''
+    body = ''
+    if msg.is_multipart():
+        chunks = []
+        budget = MAX_BODY_BYTES
+        for part in msg.walk():
+            if part.get_content_type() != 'text/plain':
+                continue
+            payload = part.get_payload(decode=True)
+            if not payload:
+                continue
+            if len(payload) > budget:
+                payload = payload[:budget]
+            budget -= len(payload)
+            chunks.append(decode_text(payload, part.get_content_charset()))
+            if budget <= 0:
+                break
+        body = ''.join(chunks)
+    else:
+        payload = msg.get_payload(decode=True)
+        body = decode_text(payload[:MAX_BODY_BYTES], None) if payload else ''
+    return {'sender': sender,'subject': subject,'body': body,'received_at': now_iso or _now_iso()}
+
+
+# (dir mtime, limit) -> selected paths; polls between sink writes skip the
+# directory scan entirely since the dir mtime only moves on create/delete
+_sink_scan_cache: tuple[float, int, List[str]] | None = None
+
+
+def _sink_recent_files(path: str, limit: int) -> List[str]:
+    global _sink_scan_cache
+    dir_mtime = os.stat(path).st_mtime
+    cached = _sink_scan_cache
+    if cached is not None and cached[0] == dir_mtime and cached[1] == limit:
+        return cached[2]
+    # scandir keeps the stat from the directory read, so mtime selection is
+    # one pass with no extra syscall per entry; nlargest is O(N log limit)
+    # where a full name sort was O(N log N)
+    with os.scandir(path) as entries:
+        eml = [e for e in entries if e.name.endswith('.eml')]
+    recent = heapq.nlargest(limit, eml, key=lambda e: e.stat().st_mtime)
+    files = [e.path for e in recent]
+    _sink_scan_cache = (dir_mtime, limit, files)
+    return files
+
+
 def fetch_from_smtp_sink(limit: int) -> List[Dict]:
     """Placeholder for a custom SMTP sink (e.g., MailHog / local directory)."""
     path = os.getenv('SMTP_SINK_DIR')
     if not path or not os.path.isdir(path):
         return []
-    mails: List[Dict] = []
     try:
-        files = sorted([f for f in os.listdir(path) if f.endswith('.eml')])[-limit:]
-        import email
-        for fname in files:
-            with open(os.path.join(path, fname), 'rb') as fh:
-                msg = email.message_from_bytes(fh.read())
-            sender = msg.get('From') or ''
-            subject = msg.get('Subject') or ''
-            body = ''
-            if msg.is_multipart():
-                for part in msg.walk():
-                    if part.get_content_type() == 'text/plain':
-                        body += part.get_payload(decode=True).decode(part.get_content_charset() or 'utf-8', errors='ignore')
-            else:
-                payload = msg.get_payload(decode=True)
-                body = payload.decode('utf-8', errors='ignore') if payload else ''
-            mails.append({'sender': sender,'subject': subject,'body': body,'received_at': _now_iso()})
+        files = _sink_recent_files(path, limit)
+        if not files:
+            return []
+        # file reads + MIME parsing release the GIL enough to overlap; map
+        # keeps results in newest-first order, matching the other providers
+        with ThreadPoolExecutor(max_workers=min(8, len(files))) as pool:
+            return list(pool.map(partial(_parse_eml, now_iso=_now_iso()), files))
     except Exception:
         return []
-    return mails
 
 
 PROVIDERS = {
@@ -234,7 +477,6 @@ def set_runtime_provider(provider: str | None):
             raise ValueError(f"Unknown provider '{provider}'")
         RUNTIME_PROVIDER_OVERRIDE = provider
     # log change for debugging stuck mode issues
-    import logging
     logging.getLogger(__name__).info("runtime_provider_set", extra={"provider": RUNTIME_PROVIDER_OVERRIDE})
 
 def get_runtime_provider() -> str:
@@ -0,0 +1,136 @@
+"""Embedding-based reply cache for near-duplicate tickets.
+
+Customers describing the same issue rarely produce byte-identical emails, so
+the exact-match LRU in auto_responder misses on greetings/typos/reordering.
+This cache embeds subject+body, does a top-1 cosine lookup in a small faiss
+index and reuses the stored reply when similarity clears
+SEMANTIC_CACHE_THRESHOLD — turning a repeat-topic ticket into a sub-ms vector
+lookup instead of an LLM call.
+
+Opt-in via SEMANTIC_REPLY_CACHE=1: reusing a reply for a merely-similar ticket
+is a correctness trade-off, so it is off unless a deployment accepts it. The
+encoder is borrowed from the already-loaded RAG engine (set_embedder is called
+once RAG init completes) so no second model is ever loaded.
+"""
+from __future__ import annotations
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+try:  # pragma: no cover - optional ML deps (same guard as the RAG import)
+    import faiss  # type: ignore
+    import numpy as np  # type: ignore
+    FAISS_AVAILABLE = True
+except ImportError:  # pragma: no cover
+    faiss = None  # type: ignore
+    np = None  # type: ignore
+    FAISS_AVAILABLE = False
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.93'))
+SEMANTIC_CACHE_TTL_S = float(os.getenv('SEMANTIC_CACHE_TTL_S', '3600'))
+SEMANTIC_CACHE_MAX = int(os.getenv('SEMANTIC_CACHE_MAX', '4096'))
+
+_lock = threading.RLock()
+_embed: Optional[Callable] = None  # set by RAG init; signature: List[str] -> np.ndarray
+_index = None  # faiss.IndexIDMap over IndexFlatIP; embeddings arrive L2-normalized
+_replies: Dict[int, tuple] = {}  # id -> (reply, priority-or-None)
+_ages: "deque[tuple[int, float]]" = deque()  # (id, inserted_at), insertion order
+_next_id = 0
+_stats = {"hits": 0, "misses": 0}
+
+
+def enabled() -> bool:
+    return (
+        os.getenv('SEMANTIC_REPLY_CACHE') == '1'
+        and FAISS_AVAILABLE
+        and _embed is not None
+    )
+
+
+def set_embedder(fn: Callable) -> None:
+    """Register the shared encode function (called once the RAG engine is up)."""
+    global _embed
+    with _lock:
+        _embed = fn
+
+
+def _prune(now: float) -> None:
+    """Drop expired and over-capacity entries (caller holds _lock)."""
+    expired = []
+    while _ages and (now - _ages[0][1] > SEMANTIC_CACHE_TTL_S or len(_ages) > SEMANTIC_CACHE_MAX):
+        vec_id, _ts = _ages.popleft()
+        _replies.pop(vec_id, None)
+        expired.append(vec_id)
+    if expired and _index is not None:
+        try:
+            _index.remove_ids(np.asarray(expired, dtype='int64'))
+        except Exception:  # pragma: no cover - index stays slightly oversized
+            pass
+
+
+def lookup(text: str, priority: Optional[str] = None) -> Optional[str]:
+    """Return a cached reply for a semantically-equivalent ticket, else None.
+
+    When priority is given, a hit must also have been stored under the same
+    priority — an urgent ticket should never receive a reply drafted for a
+    routine one, however similar the wording.
+    """
+    if not enabled():
+        return None
+    try:
+        vec = _embed([text])
+        with _lock:
+            if _index is None or _index.ntotal == 0:
+                _stats["misses"] += 1
+                return None
+            scores, ids = _index.search(vec, 1)
+            score, vec_id = float(scores[0][0]), int(ids[0][0])
+            entry = _replies.get(vec_id)
+            if (
+                entry is not None
+                and score >= SEMANTIC_CACHE_THRESHOLD
+                and (priority is None or entry[1] is None or entry[1] == priority)
+            ):
+                _stats["hits"] += 1
+                return entry[0]
+            _stats["misses"] += 1
+    except Exception as e:  # pragma: no cover - cache must never break generation
+        logging.getLogger(__name__).warning("semantic_cache_lookup_failed", exc_info=e)
+    return None
+
+
+def store(text: str, reply: str, priority: Optional[str] = None) -> None:
+    """Index a freshly generated reply under the ticket's embedding."""
+    if not enabled() or not reply:
+        return
+    global _index, _next_id
+    try:
+        vec = _embed([text])
+        with _lock:
+            if _index is None:
+                _index = faiss.IndexIDMap(
+                    faiss.IndexFlatIP(vec.shape[1])
+                )
+            now = time.time()
+            _prune(now)
+            vec_id = _next_id
+            _next_id += 1
+            _index.add_with_ids(vec, np.asarray([vec_id], dtype='int64'))
+            _replies[vec_id] = (reply, priority)
+            _ages.append((vec_id, now))
+    except Exception as e:  # pragma: no cover
+        logging.getLogger(__name__).warning("semantic_cache_store_failed", exc_info=e)
+
+
+def stats() -> Dict[str, object]:
+    with _lock:
+        return {
+            "enabled": enabled(),
+            "hits": _stats["hits"],
+            "misses": _stats["misses"],
+            "size": len(_replies),
+            "threshold": SEMANTIC_CACHE_THRESHOLD,
+        }
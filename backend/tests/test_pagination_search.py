@@ -42,6 +42,19 @@ def test_pagination_and_shape():
         assert not all(e['id'] in first_page_ids for e in data2['items'])
 
 
+def test_ndjson_stream():
+    _seed('NDJSONMARKER Stream', 'Body for ndjson streaming test')
+    r = client.get('/api/emails/stream.ndjson?limit=5')
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('application/x-ndjson')
+    import json as _json
+    lines = [l for l in r.text.splitlines() if l]
+    assert 0 < len(lines) <= 5
+    for line in lines:
+        obj = _json.loads(line)
+        assert 'id' in obj and 'subject' in obj
+
+
 def test_search_filter():
     # Ensure a specific searchable subject exists
     _seed('UniqueSearchMarkerXYZ', 'Content for search indexing')
@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+from backend.app.main import app
+from datetime import datetime, timezone
+
+client = TestClient(app)
+
+
+def test_stream_persists_assembled_reply():
+    payload = {
+        "sender": "streamer@example.com",
+        "subject": "Support - streaming persistence check",
+        "body": "Please confirm the streamed reply is saved afterwards.",
+        "received_at": datetime.now(timezone.utc).isoformat()
+    }
+    r = client.post('/api/emails/ingest', json=payload)
+    assert r.status_code == 200
+    email_id = r.json()['id']
+
+    # TestClient drains the body, so the generator's persist step has run
+    rs = client.post(f'/api/emails/{email_id}/regenerate/stream')
+    assert rs.status_code == 200
+    streamed = rs.text.strip()
+    assert streamed
+
+    rg = client.get(f'/api/emails/{email_id}')
+    assert rg.status_code == 200
+    assert rg.json()['auto_response'] == streamed